@@ -1,9 +1,17 @@
 import os
+import re
 import sys
 import time
 import json
+import hashlib
+import sqlite3
+import threading
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 from tqdm import tqdm
 from dotenv import load_dotenv
@@ -29,15 +37,109 @@ def print_warning(message):
 def print_success(message):
     print(f"[SUCCESS] {message}")
 
+TRANSLATION_SEPARATOR = "<<<SEP>>>"  # delimits texts packed into one batched request
+REQUESTS_PER_MINUTE = 60  # OpenRouter request budget shared by the translation workers
+TRANSLATION_WORKERS = 8  # concurrent OpenRouter requests
+CHECKPOINT_SYNC_EVERY = 50  # flush + fsync the checkpoint after this many translations
+
+# Common translation response prefixes to remove (case insensitive); the first match in list order wins
+RESPONSE_PREFIX_RE = re.compile("^(?:" + "|".join(map(re.escape, [
+    "Answer:",
+    "Réponse:",
+    "The answer is:",
+    "To answer your question:",
+    "Here is the translation:",
+    "Translation:",
+    "Traduction:",
+    "The translation is:",
+    "Here's the translation:",
+    "The translated text is:",
+    "English translation:",
+    "In English:"
+])) + ")", re.IGNORECASE)
+
+@lru_cache(maxsize=None)
+def build_system_prompt(text_type, count=1):
+    """System prompt for translating one text, or `count` separator-delimited texts; built once per (text_type, count)."""
+    system_prompt = f"""You are a professional translator. Translate the following {text_type} to English. 
+If it's already in English, output the same text or provide a paraphrased version that maintains the same meaning.
+Maintain the original meaning, tone, and formatting. Preserve markdown formatting. 
+Do not add or remove information. 
+Return ONLY the direct translated content without any prefixes like 'The answer is:', 'To answer your question:', 'Here is the translation:', or any other introductory phrases.
+Just provide the direct content."""
+    if count > 1:
+        system_prompt += f"""
+The input contains {count} separate {text_type}s, separated by lines containing only {TRANSLATION_SEPARATOR}.
+Translate each one independently and output exactly {count} translations in the same order, separated by lines containing only {TRANSLATION_SEPARATOR}."""
+    return system_prompt
+
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` requests per `period` seconds, with bursts up to `rate`."""
+    def __init__(self, rate, period=60.0):
+        self.capacity = rate
+        self.tokens = float(rate)
+        self.fill_rate = rate / period
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Take a token, sleeping only if the bucket is empty."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+            self.updated = now
+            self.tokens -= 1  # reserve the token now so waiting callers queue up in order
+            wait = -self.tokens / self.fill_rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+    
+    def update(self, remaining):
+        """Clamp the bucket to the request budget the provider reports as remaining."""
+        with self.lock:
+            self.tokens = min(self.tokens, remaining)
+
 class FinetuningDataTranslator:
-    def __init__(self, input_csv, output_csv, output_instruction, output_chat):
+    def __init__(self, input_csv, output_csv, output_instruction, output_chat, verbose=False):
         self.input_csv = input_csv
         self.output_csv = output_csv
         self.output_instruction = output_instruction
         self.output_chat = output_chat
+        self.verbose = verbose  # echo every text sent and received; off keeps the workers off the terminal
+        # Append-only log of finished translations ({"idx", "col", "val"} per line) for resuming
+        self.checkpoint_jsonl = Path(output_csv).with_name(Path(output_csv).stem + ".checkpoint.jsonl")
+        # Responses keyed by a hash of model + request, so re-runs and duplicate texts skip the API
+        self.cache = sqlite3.connect(Path(output_csv).with_name(".llm_cache.sqlite"), check_same_thread=False)
+        self.cache_lock = threading.Lock()
+        self.cache.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL)")
+        self.cache_stats = {"hits": 0, "misses": 0}
+        self.rate_limiter = RateLimiter(REQUESTS_PER_MINUTE)
+        self.memo = {}  # (text_type, text) -> translation, for texts repeated within a run
         self.api_key = os.getenv('OPENROUTER_API_KEY')
         self.model = "google/gemini-2.5-flash-preview"
         
+        # Pooled keep-alive session; the adapter retries 429/5xx with jittered exponential backoff
+        # (capped at 60s, honoring Retry-After), while other 4xx responses fail fast
+        retry_kwargs = dict(total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                            allowed_methods=frozenset({"POST"}))
+        try:
+            retries = Retry(backoff_max=60, backoff_jitter=1, **retry_kwargs)
+        except TypeError:
+            # urllib3 1.x has no backoff_max/backoff_jitter arguments: unjittered backoff capped at 120s
+            retries = Retry(**retry_kwargs)
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=32,
+            max_retries=retries
+        ))
+        # Request headers are fixed for the run, so set them once on the session
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "http://localhost:3000",
+            "X-Title": "Diabot Medical Assistant"
+        })
+        
         if not self.api_key:
             print_error("OpenRouter API key not found in environment variables.")
             print_info("Please set the OPENROUTER_API_KEY environment variable.")
@@ -49,101 +151,133 @@ class FinetuningDataTranslator:
         print_info(f"Output Instruction JSONL: {self.output_instruction}")
         print_info(f"Output Chat JSONL: {self.output_chat}")
     
-    def translate_text(self, text, text_type="text"):
-        """Translate text using OpenRouter API with Gemini 2.5 Flash."""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "http://localhost:3000",
-            "X-Title": "Diabot Medical Assistant"
-        }
+    def request_translation(self, system_prompt, content, accept=None):
+        """Send one chat completion request; returns the raw response text or None on failure.
         
-        system_prompt = f"""You are a professional translator. Translate the following {text_type} to English. 
-If it's already in English, output the same text or provide a paraphrased version that maintains the same meaning.
-Maintain the original meaning, tone, and formatting. Preserve markdown formatting. 
-Do not add or remove information. 
-Return ONLY the direct translated content without any prefixes like 'The answer is:', 'To answer your question:', 'Here is the translation:', or any other introductory phrases.
-Just provide the direct content."""
+        If `accept` is given, only responses it returns True for are cached or reused.
+        """
+        key = hashlib.sha256(f"{self.model}|{system_prompt}|{content}".encode('utf-8')).hexdigest()
+        with self.cache_lock:
+            row = self.cache.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and accept and not accept(row[0]):
+                row = None
+            self.cache_stats["hits" if row else "misses"] += 1
+        if row:
+            return row[0]
         
         data = {
             "model": self.model,
             "messages": [
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": text}
+                {"role": "user", "content": content}
             ],
             "temperature": 0.1  # Low temperature for more consistent translations
         }
         
-        print_info(f"📤 Sending to API - {text_type}:")
-        print(f"   Original: {text[:100]}{'...' if len(text) > 100 else ''}")
+        self.rate_limiter.acquire()
+        try:
+            # Transient HTTP failures are retried by the session's adapter
+            response = self.session.post(
+                "https://openrouter.ai/api/v1/chat/completions",
+                json=data,
+                timeout=(10, 120)
+            )
+            remaining = response.headers.get("X-RateLimit-Remaining", "")
+            if remaining.isdigit():
+                self.rate_limiter.update(int(remaining))
+            response.raise_for_status()
+            content = response.json()["choices"][0]["message"]["content"].strip()
+            
+        except requests.exceptions.RequestException as e:
+            print_error(f"Translation failed: {e}")
+            return None
+        except Exception as e:
+            print_error(f"Unexpected error: {e}")
+            return None
         
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = requests.post(
-                    "https://openrouter.ai/api/v1/chat/completions",
-                    headers=headers,
-                    json=data,
-                    timeout=30
-                )
-                response.raise_for_status()
-                raw_result = response.json()["choices"][0]["message"]["content"].strip()
-                
-                print_info(f"📥 Raw API Response:")
-                print(f"   Raw: {raw_result[:200]}{'...' if len(raw_result) > 200 else ''}")
-                
-                # Additional cleaning to remove common prefixes
-                result = self.clean_translation_response(raw_result)
-                
-                print_info(f"🧹 After Cleaning:")
-                print(f"   Cleaned: {result[:200]}{'...' if len(result) > 200 else ''}")
-                print("-" * 80)
-                
-                return result
-                
-            except requests.exceptions.RequestException as e:
-                print_error(f"Request error on attempt {attempt+1}: {e}")
-                if attempt == max_retries - 1:
-                    print_error(f"Translation failed after {max_retries} attempts")
-                    return None
-                time.sleep(3)  # Longer wait on request errors
-            except Exception as e:
-                print_error(f"Unexpected error on attempt {attempt+1}: {e}")
-                if attempt == max_retries - 1:
-                    return None
-                time.sleep(2)
+        if accept and not accept(content):
+            return content
+        with self.cache_lock, self.cache:
+            self.cache.execute("INSERT OR REPLACE INTO responses (key, response) VALUES (?, ?)", (key, content))
+        return content
+    
+    def translate_text(self, text, text_type="text"):
+        """Translate text using OpenRouter API with Gemini 2.5 Flash."""
+        if self.verbose:
+            print_info(f"📤 Sending to API - {text_type}:")
+            print(f"   Original: {text[:100]}{'...' if len(text) > 100 else ''}")
+        
+        raw_result = self.request_translation(build_system_prompt(text_type), text)
+        if raw_result is None:
+            return None
+        
+        # Additional cleaning to remove common prefixes
+        result = self.clean_translation_response(raw_result)
+        
+        if self.verbose:
+            print_info(f"📥 Raw API Response:")
+            print(f"   Raw: {raw_result[:200]}{'...' if len(raw_result) > 200 else ''}")
+            print_info(f"🧹 After Cleaning:")
+            print(f"   Cleaned: {result[:200]}{'...' if len(result) > 200 else ''}")
+            print("-" * 80)
+        
+        return result
+    
+    def translate_texts(self, texts, text_type="text"):
+        """Translate several texts, sending each distinct text not yet translated in this run once."""
+        results = [self.memo.get((text_type, text)) for text in texts]
+        missing = list(dict.fromkeys(text for text, result in zip(texts, results) if result is None))
+        if not missing:
+            return results
+        
+        translations = dict(zip(missing, self.translate_batch(missing, text_type)))
+        for text, translation in translations.items():
+            if translation:
+                self.memo[(text_type, text)] = translation
+        return [translations[text] if result is None else result for text, result in zip(texts, results)]
+    
+    def translate_batch(self, texts, text_type="text"):
+        """Translate several texts with a single request (one API call instead of len(texts)).
+        
+        Falls back to one request per text if the response doesn't split into exactly
+        len(texts) parts. Failed translations are None.
+        """
+        if len(texts) == 1:
+            return [self.translate_text(texts[0], text_type)]
+        
+        if self.verbose:
+            print_info(f"📤 Sending {len(texts)} {text_type}s in one request")
+        raw_result = self.request_translation(build_system_prompt(text_type, len(texts)),
+                                              f"\n{TRANSLATION_SEPARATOR}\n".join(texts),
+                                              accept=lambda response: len(response.split(TRANSLATION_SEPARATOR)) == len(texts))
+        parts = raw_result.split(TRANSLATION_SEPARATOR) if raw_result else []
+        if len(parts) != len(texts):
+            print_warning(f"Batched response has {len(parts)} parts for {len(texts)} {text_type}s, "
+                          f"translating them one by one")
+            return [self.translate_text(text, text_type) for text in texts]
+        return [self.clean_translation_response(part.strip()) or None for part in parts]
     
     def clean_translation_response(self, text):
         """Remove common translation response prefixes and clean the response."""
         if not isinstance(text, str):
             return text
-            
-        # List of common prefixes to remove (case insensitive)
-        prefixes_to_remove = [
-            "Answer:",
-            "Réponse:",
-            "The answer is:",
-            "To answer your question:",
-            "Here is the translation:",
-            "Translation:",
-            "Traduction:",
-            "The translation is:",
-            "Here's the translation:",
-            "The translated text is:",
-            "English translation:",
-            "In English:"
-        ]
-        
-        text_clean = text.strip()
-        
-        for prefix in prefixes_to_remove:
-            if text_clean.lower().startswith(prefix.lower()):
-                text_clean = text_clean[len(prefix):].strip()
-                break
         
-        return text_clean
+        return RESPONSE_PREFIX_RE.sub('', text.strip(), count=1).strip()
     
-    def translate_dataset(self, batch_size=2, test_mode=False, max_test_rows=10):
+    def load_checkpoint(self):
+        """Read completed (row index, column) -> translation pairs from the JSONL checkpoint."""
+        done = {}
+        if self.checkpoint_jsonl.exists():
+            with open(self.checkpoint_jsonl, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line from an interrupted run
+                    done[(record["idx"], record["col"])] = record["val"]
+        return done
+    
+    def translate_dataset(self, question_batch_size=8, answer_batch_size=3, test_mode=False, max_test_rows=10):
         """Translate the dataset from French to English."""
         print_step("Loading and translating finetuning dataset")
         
@@ -155,8 +289,8 @@ Just provide the direct content."""
             # Display first few rows for verification
             print_info("Sample of original data:")
             for i in range(min(3, len(df))):
-                print(f"  Row {i+1} Question: {df.iloc[i]['question'][:80]}...")
-                print(f"  Row {i+1} Answer: {df.iloc[i]['model_answer'][:80]}...")
+                print(f"  Row {i+1} Question: {str(df.iloc[i]['question'])[:80]}...")
+                print(f"  Row {i+1} Answer: {str(df.iloc[i]['model_answer'])[:80]}...")
             
             # If in test mode, only process a limited number of rows
             if test_mode:
@@ -167,72 +301,93 @@ Just provide the direct content."""
             print_error(f"Error loading CSV: {e}")
             return None
         
-        # Create new columns for translated content
-        df['question_english'] = ''
-        df['model_answer_english'] = ''
+        # Buffer translated content in positional lists; each column is assigned once after the loop
+        sources = {column: df[column].tolist() for column in ('question', 'model_answer')}
+        translations = {column: [''] * len(df) for column in ('question_english', 'model_answer_english')}
+        
+        # Restore translations finished by an interrupted run
+        done = self.load_checkpoint()
+        for (idx, column), value in done.items():
+            if idx < len(df):
+                translations[column][idx] = value
+        if done:
+            print_info(f"Resuming: {len(done)} translations restored from {self.checkpoint_jsonl}")
+        checkpoint = open(self.checkpoint_jsonl, 'a', encoding='utf-8', buffering=1 << 16)
         
-        # Process in batches to avoid API rate limits
+        # Process in batches; the rate limiter paces the API requests
         total_rows = len(df)
         successful_translations = 0
         failed_translations = 0
         
-        for i in tqdm(range(0, total_rows, batch_size), desc="Translating batches"):
-            batch_end = min(i + batch_size, total_rows)
-            batch_df = df.iloc[i:batch_end]
-            
-            # Translate questions
-            for idx in batch_df.index:
-                question = df.at[idx, 'question']
-                print_step(f"TRANSLATING QUESTION {idx+1}/{total_rows}")
-                print_info(f"Original Question: {question}")
-                
-                translated = self.translate_text(question, "question")
-                if translated:
-                    df.at[idx, 'question_english'] = translated
-                    successful_translations += 1
-                    print_success(f"✅ QUESTION TRANSLATION SUCCESS")
-                    print_info(f"Final Result: {translated}")
-                else:
-                    df.at[idx, 'question_english'] = question  # Keep original if translation fails
-                    failed_translations += 1
-                    print_warning(f"❌ Question translation failed, keeping original")
-                
-                # Save progress after each translation
-                df.to_csv(self.output_csv, index=False)
-                print_info(f"💾 Progress saved to {self.output_csv}")
-                time.sleep(2)  # Increased delay to avoid rate limits
-            
-            # Translate answers
-            for idx in batch_df.index:
-                answer = df.at[idx, 'model_answer']
-                print_step(f"TRANSLATING ANSWER {idx+1}/{total_rows}")
-                print_info(f"Original Answer: {answer[:300]}{'...' if len(answer) > 300 else ''}")
-                
-                translated = self.translate_text(answer, "answer")
-                if translated:
-                    df.at[idx, 'model_answer_english'] = translated
-                    successful_translations += 1
-                    print_success(f"✅ ANSWER TRANSLATION SUCCESS")
-                    print_info(f"Final Result: {translated[:300]}{'...' if len(translated) > 300 else ''}")
-                else:
-                    df.at[idx, 'model_answer_english'] = answer  # Keep original if translation fails
-                    failed_translations += 1
-                    print_warning(f"❌ Answer translation failed, keeping original")
-                
-                # Save progress after each translation
-                df.to_csv(self.output_csv, index=False)
-                print_info(f"💾 Progress saved to {self.output_csv}")
-                time.sleep(2)  # Increased delay to avoid rate limits
+        # One request per batch of texts from a single field; questions and answers are independent.
+        # Long answers get smaller batches, and sorting by length keeps one long text from
+        # stretching the latency of a batch of short ones.
+        # A row missing its question or answer can't become a training example, so neither
+        # field is sent; such rows are dropped before export
+        complete = [all(isinstance(sources[column][idx], str) and sources[column][idx].strip()
+                        for column in sources) for idx in range(total_rows)]
+        if not all(complete):
+            print_warning(f"Skipping {complete.count(False)} rows with an empty question or answer")
+        tasks = []
+        for text_type, source_column, target_column, batch_size in (
+                ("question", 'question', 'question_english', question_batch_size),
+                ("answer", 'model_answer', 'model_answer_english', answer_batch_size)):
+            texts = sources[source_column]
+            pending = [idx for idx in range(total_rows) if complete[idx] and (idx, target_column) not in done]
+            pending.sort(key=lambda idx: len(texts[idx]))
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                tasks.append((text_type, target_column, batch, [texts[idx] for idx in batch]))
         
+        # Keep up to TRANSLATION_WORKERS requests in flight; results are applied on this thread as they land
+        executor = ThreadPoolExecutor(max_workers=TRANSLATION_WORKERS)
+        try:
+            futures = {executor.submit(self.translate_texts, originals, text_type): (text_type, target_column, pending, originals)
+                       for text_type, target_column, pending, originals in tasks}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Translating batches"):
+                text_type, target_column, pending, originals = futures[future]
+                if self.verbose:
+                    print_step(f"TRANSLATED {len(pending)} {text_type.upper()}S (rows {', '.join(str(idx + 1) for idx in pending)})")
+                for idx, original, translated in zip(pending, originals, future.result()):
+                    if translated:
+                        translations[target_column][idx] = translated
+                        checkpoint.write(json.dumps({"idx": int(idx), "col": target_column, "val": translated},
+                                                    ensure_ascii=False) + '\n')
+                        successful_translations += 1
+                        if successful_translations % CHECKPOINT_SYNC_EVERY == 0:
+                            # Bound what a hard crash can lose without syncing every line
+                            checkpoint.flush()
+                            os.fsync(checkpoint.fileno())
+                        if self.verbose:
+                            print_success(f"✅ {text_type.upper()} {idx+1} TRANSLATION SUCCESS")
+                            print_info(f"Final Result: {translated[:300]}{'...' if len(translated) > 300 else ''}")
+                    else:
+                        translations[target_column][idx] = original  # Keep original if translation fails
+                        failed_translations += 1
+                        print_warning(f"❌ {text_type.capitalize()} {idx+1} translation failed, keeping original")
+        finally:
+            # On interruption, drop queued requests instead of waiting for them
+            executor.shutdown(cancel_futures=True)
+            checkpoint.close()
         print_info(f"Translation Summary: {successful_translations} successful, {failed_translations} failed")
+        print_info(f"LLM cache: {self.cache_stats['hits']} hits, {self.cache_stats['misses']} misses")
         
         # Create final dataframe with English content
+        df['question_english'] = translations['question_english']
+        df['model_answer_english'] = translations['model_answer_english']
         english_df = df[['question_id', 'question_english', 'model_answer_english']].copy()
         english_df.columns = ['question_id', 'question', 'model_answer']
-        
+
+        # Safeguard: rows with an empty question or answer would become empty training examples
+        complete = english_df['question'].str.strip().astype(bool) & english_df['model_answer'].str.strip().astype(bool)
+        if not complete.all():
+            print_warning(f"Dropping {int((~complete).sum())} rows with an empty question or answer")
+            english_df = english_df[complete].reset_index(drop=True)
+
         # Save final English dataset
         print_info(f"Writing final English dataset to {self.output_csv}")
         english_df.to_csv(self.output_csv, index=False)
+        self.checkpoint_jsonl.unlink(missing_ok=True)  # only needed until the CSV is materialized
         print_success(f"Translation complete! {len(english_df)} rows processed.")
         
         # Display sample of translated data
@@ -245,45 +400,25 @@ Just provide the direct content."""
         
         return english_df
     
-    def convert_to_instruction_format(self, df):
-        """Convert the dataset to instruction format with prompt and completion fields."""
-        print_step("Converting to instruction format")
+    def convert_formats(self, df):
+        """Convert the dataset to instruction format (prompt/completion) and chat format (messages) in one pass."""
+        print_step("Converting to instruction and chat formats")
         
-        # Create instruction format data
-        instruction_data = []
-        for _, row in df.iterrows():
-            instruction_data.append({
-                "prompt": row['question'],
-                "completion": row['model_answer']
-            })
+        # Save both JSONL files, emitting each row's two representations together
+        rows = 0
+        with open(self.output_instruction, 'w', encoding='utf-8', buffering=1 << 20) as instruction_file, \
+                open(self.output_chat, 'w', encoding='utf-8', buffering=1 << 20) as chat_file:
+            for question, answer in zip(df['question'].tolist(), df['model_answer'].tolist()):
+                instruction_file.write(json.dumps({"prompt": question, "completion": answer}, ensure_ascii=False) + '\n')
+                chat_file.write(json.dumps({
+                    "messages": [
+                        {"role": "user", "content": question},
+                        {"role": "assistant", "content": answer}
+                    ]
+                }, ensure_ascii=False) + '\n')
+                rows += 1
         
-        # Save to JSONL file
-        with open(self.output_instruction, 'w', encoding='utf-8') as f:
-            for item in instruction_data:
-                f.write(json.dumps(item, ensure_ascii=False) + '\n')
-        
-        print_success(f"Conversion complete! {len(instruction_data)} rows converted to instruction format.")
-    
-    def convert_to_chat_format(self, df):
-        """Convert the dataset to chat format with messages field."""
-        print_step("Converting to chat format")
-        
-        # Create chat format data
-        chat_data = []
-        for _, row in df.iterrows():
-            chat_data.append({
-                "messages": [
-                    {"role": "user", "content": row['question']},
-                    {"role": "assistant", "content": row['model_answer']}
-                ]
-            })
-        
-        # Save to JSONL file
-        with open(self.output_chat, 'w', encoding='utf-8') as f:
-            for item in chat_data:
-                f.write(json.dumps(item, ensure_ascii=False) + '\n')
-        
-        print_success(f"Conversion complete! {len(chat_data)} rows converted to chat format.")
+        print_success(f"Conversion complete! {rows} rows converted to instruction and chat formats.")
     
     def process(self, test_mode=False):
         """Process the finetuning dataset: translate, clean, and convert to different formats."""
@@ -293,11 +428,8 @@ Just provide the direct content."""
             if english_df is None:
                 return
             
-            # Convert to instruction format
-            self.convert_to_instruction_format(english_df)
-            
-            # Convert to chat format
-            self.convert_to_chat_format(english_df)
+            # Convert to instruction and chat formats
+            self.convert_formats(english_df)
             
             print_step("All processing complete!")
             print_info(f"1. Translated CSV: {self.output_csv}")
@@ -316,6 +448,7 @@ if __name__ == "__main__":
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="Translate finetuning dataset from French to English")
     parser.add_argument("--test", action="store_true", help="Run in test mode with only 10 rows")
+    parser.add_argument("--verbose", action="store_true", help="Print every text sent to and received from the API")
     args = parser.parse_args()
     
     # Define file paths
@@ -325,7 +458,7 @@ if __name__ == "__main__":
     output_chat = Path(r"c:\Users\Usuario\OneDrive\Desktop\Diabot-V2\finetuning_data_chat.jsonl")
     
     # Create and run the translator
-    translator = FinetuningDataTranslator(input_csv, output_csv, output_instruction, output_chat)
+    translator = FinetuningDataTranslator(input_csv, output_csv, output_instruction, output_chat, verbose=args.verbose)
     
     # Force test mode for now
     print_warning("🧪 RUNNING IN TEST MODE (10 rows only)")
@@ -1,10 +1,16 @@
 import os
 import csv
-import time
 import json
+import hashlib
+import sqlite3
+import threading
+import time
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pathlib import Path
 
 # Load environment variables from .env file
@@ -13,21 +19,88 @@ load_dotenv()
 # Configuration
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
 MODEL_NAME = "google/gemini-2.5-flash-preview"
+SUMMARY_WORKERS = 10  # concurrent OpenRouter requests
+SUMMARY_BATCH_SIZE = 5  # Q/A pairs summarized per request
+SUMMARY_SEPARATOR = "<<<SEP>>>"
+REQUESTS_PER_MINUTE = 60  # OpenRouter request budget shared by all workers
+CHECKPOINT_SYNC_EVERY = 50  # flush + fsync the checkpoint after this many rows
 
 # Get the project root directory (two levels up from this script)
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 INPUT_CSV = PROJECT_ROOT / "Benchmarking" / "Datasets" / "processed" / "Benchmarking-QA-Diabetes-With-Wrong-Answers.csv"
 OUTPUT_DIR = PROJECT_ROOT / "Benchmarking" / "Datasets" / "processed"
 OUTPUT_CSV = OUTPUT_DIR / "Diabetes_QA_With_Summarized_A.csv"
+# Append-only log of completed rows ({"idx", "col", "val"} per line); lets an interrupted run resume
+CHECKPOINT_JSONL = OUTPUT_CSV.with_name(OUTPUT_CSV.stem + ".checkpoint.jsonl")
+# Responses keyed by a hash of model + request, shared across runs and duplicate rows
+LLM_CACHE_DB = OUTPUT_DIR / ".llm_cache.sqlite"
 
 # Ensure output directory exists
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-def call_openrouter(prompt):
-    """Call OpenRouter API to generate summarized answers."""
+# One pooled keep-alive session for all workers; retries 429/5xx with exponential backoff
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=frozenset({"POST"}))
+))
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+_CACHE_STATS = {"hits": 0, "misses": 0}
+
+def _cache():
+    """Open the response cache on first use; callers must hold _CACHE_LOCK."""
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = sqlite3.connect(LLM_CACHE_DB, check_same_thread=False)
+        _CACHE.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL)")
+    return _CACHE
+
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` requests per `period` seconds, with bursts up to `rate`."""
+    def __init__(self, rate, period=60.0):
+        self.capacity = rate
+        self.tokens = float(rate)
+        self.fill_rate = rate / period
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Take a token, sleeping only if the bucket is empty."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+            self.updated = now
+            self.tokens -= 1  # reserve the token now so waiting callers queue up in order
+            wait = -self.tokens / self.fill_rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+_RATE_LIMITER = RateLimiter(REQUESTS_PER_MINUTE)
+
+def _cache_key(prompt, max_tokens):
+    return hashlib.sha256(f"{MODEL_NAME}|{max_tokens}|{prompt}".encode('utf-8')).hexdigest()
+
+def call_openrouter(prompt, max_tokens=500, accept=None):
+    """Call OpenRouter API to generate summarized answers, reusing cached responses.
+    
+    If `accept` is given, only responses it returns True for are cached or reused.
+    """
     if not OPENROUTER_API_KEY:
         raise ValueError("OpenRouter API key not found in environment variables")
     
+    key = _cache_key(prompt, max_tokens)
+    with _CACHE_LOCK:
+        row = _cache().execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row and accept and not accept(row[0]):
+            row = None
+        _CACHE_STATS["hits" if row else "misses"] += 1
+    if row:
+        return row[0]
+    
     headers = {
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
         "Content-Type": "application/json",
@@ -44,20 +117,28 @@ def call_openrouter(prompt):
             }
         ],
         "temperature": 0.3,  # Lower temperature for more consistent summaries
-        "max_tokens": 500
+        "max_tokens": max_tokens
     }
     
+    _RATE_LIMITER.acquire()
     try:
-        response = requests.post(
+        response = _SESSION.post(
             "https://openrouter.ai/api/v1/chat/completions",
             headers=headers,
-            json=data
+            json=data,
+            timeout=(10, 120)
         )
         response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"].strip()
+        content = response.json()["choices"][0]["message"]["content"].strip()
     except Exception as e:
         print(f"Error calling OpenRouter API: {e}")
         return None
+    
+    if accept and not accept(content):
+        return content
+    with _CACHE_LOCK, _cache() as cache:
+        cache.execute("INSERT OR REPLACE INTO responses (key, response) VALUES (?, ?)", (key, content))
+    return content
 
 def summarize_answer(question, answer):
     """Summarize the correct answer for the given question."""
@@ -72,7 +153,10 @@ def summarize_answer(question, answer):
     Please provide only the summarized answer without any additional text or explanation. 
     Keep it under 200 characters if possible."""
     
-    response = call_openrouter(prompt)
+    return clip_summary(call_openrouter(prompt), answer)
+
+def clip_summary(response, answer):
+    """Keep the summary under 200 characters, falling back to the truncated answer."""
     if not response:
         return answer[:200] + "..." if len(answer) > 200 else answer
     
@@ -82,6 +166,50 @@ def summarize_answer(question, answer):
     
     return response
 
+def summarize_answers_batch(pairs):
+    """Summarize several (question, answer) pairs with a single request.
+    
+    Falls back to one request per pair if the response doesn't split into
+    exactly len(pairs) summaries.
+    """
+    if len(pairs) == 1:
+        return [summarize_answer(*pairs[0])]
+    
+    numbered = "\n\n".join(
+        f"{i}) QUESTION: {question}\nFULL ANSWER: {answer}" for i, (question, answer) in enumerate(pairs, 1)
+    )
+    prompt = f"""You are a medical expert specializing in diabetes. Your task is to summarize the correct answer 
+    of each of the following {len(pairs)} diabetes-related question/answer pairs. Each summary should be concise 
+    (1-2 sentences, maximum 200 characters) while preserving the key medical information and accuracy. 
+    The summaries should be clear and helpful for patients.
+    
+    {numbered}
+    
+    Output exactly {len(pairs)} summaries in the same order, separated by lines containing only {SUMMARY_SEPARATOR}. 
+    Provide only the summarized answers without numbering or any additional text or explanation."""
+    
+    def splits_evenly(response):
+        return len(response.split(SUMMARY_SEPARATOR)) == len(pairs)
+    
+    response = call_openrouter(prompt, max_tokens=500 * len(pairs), accept=splits_evenly)
+    summaries = response.split(SUMMARY_SEPARATOR) if response else []
+    if len(summaries) != len(pairs):
+        return [summarize_answer(question, answer) for question, answer in pairs]
+    return [clip_summary(summary.strip(), answer) for summary, (_, answer) in zip(summaries, pairs)]
+
+def load_checkpoint(path):
+    """Read completed (row index, column) -> value pairs from a JSONL checkpoint."""
+    done = {}
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from an interrupted run
+                done[(record["idx"], record["col"])] = record["val"]
+    return done
+
 def process_csv():
     """Process the CSV file and generate summarized answers for each question."""
     # Read the CSV file
@@ -94,40 +222,64 @@ def process_csv():
     # Create a copy of the dataframe for summarized answers
     summarized_df = df.copy()
     
-    # Process each row
+    # Restore rows finished by an interrupted run
+    done = load_checkpoint(CHECKPOINT_JSONL)
+    for (index, column), value in done.items():
+        summarized_df.at[index, column] = value
+    if done:
+        print(f"Resuming: {len(done)} rows already summarized")
+    
+    # Collect the rows that still need a summary; identical (question, answer) pairs are summarized once
     total = len(df)
-    for index, row in df.iterrows():
-        question = row.get('Question', '')
-        answer = row.get('A', '')
-        
+    pending = {}
+    # Plain column lists instead of iterrows(), which builds a Series per row
+    for index, question, answer in zip(df.index, df['Question'].tolist(), df['A'].tolist()):
         if not question or not answer:
             print(f"Skipping row {index + 1} - missing question or answer")
             continue
+        if (index, 'A') in done:
+            continue
+        pending.setdefault((question, answer), []).append(index)
+    pairs = list(pending)
+    pending_rows = sum(len(indices) for indices in pending.values())
+    if pending_rows > len(pairs):
+        print(f"{pending_rows - len(pairs)} duplicate rows will reuse another row's summary")
+    
+    # Summarize batches of pairs concurrently; the API round-trip dominates, so threads suffice
+    with ThreadPoolExecutor(max_workers=SUMMARY_WORKERS) as executor, \
+            open(CHECKPOINT_JSONL, 'a', encoding='utf-8', buffering=1 << 16) as checkpoint:
+        futures = {}
+        for start in range(0, len(pairs), SUMMARY_BATCH_SIZE):
+            batch = pairs[start:start + SUMMARY_BATCH_SIZE]
+            futures[executor.submit(summarize_answers_batch, batch)] = batch
         
-        print(f"\nProcessing {index + 1}/{total}: {question[:50]}...")
-        
-        # Summarize the answer
-        try:
-            summarized_answer = summarize_answer(question, answer)
-            
-            # Update the dataframe with the summarized answer
-            summarized_df.at[index, 'A'] = summarized_answer
-            
-            # Save progress after each row
-            summarized_df.to_csv(OUTPUT_CSV, index=False, encoding='utf-8')
-            print(f"  Summarized answer for: {question[:50]}...")
-            
-            # Add a small delay to avoid rate limiting
-            time.sleep(1)
-            
-        except Exception as e:
-            print(f"  Error processing row {index + 1}: {e}")
-            # Save progress even if there was an error
-            summarized_df.to_csv(OUTPUT_CSV, index=False, encoding='utf-8')
-    
-    # Final save
+        completed = 0
+        written = 0
+        for future in as_completed(futures):
+            batch = futures[future]
+            completed += len(batch)
+            print(f"\nCompleted {completed}/{len(pairs)} unique answers ({pending_rows} rows of {total})")
+            try:
+                # Update the dataframe with the summarized answers
+                for (question, answer), summarized_answer in zip(batch, future.result()):
+                    for index in pending[(question, answer)]:
+                        summarized_df.at[index, 'A'] = summarized_answer
+                        checkpoint.write(json.dumps({"idx": int(index), "col": "A", "val": summarized_answer},
+                                                    ensure_ascii=False) + "\n")
+                        written += 1
+                        if written % CHECKPOINT_SYNC_EVERY == 0:
+                            # Bound what a hard crash can lose without syncing every line
+                            checkpoint.flush()
+                            os.fsync(checkpoint.fileno())
+                    print(f"  Summarized answer for: {question[:50]}...")
+            except Exception as e:
+                print(f"  Error processing batch of {len(batch)} answers: {e}")
+    
+    # Materialize the CSV once; the checkpoint is only needed until then
     summarized_df.to_csv(OUTPUT_CSV, index=False, encoding='utf-8')
+    CHECKPOINT_JSONL.unlink(missing_ok=True)
     print(f"\nProcessing complete! Results saved to: {OUTPUT_CSV}")
+    print(f"LLM cache: {_CACHE_STATS['hits']} hits, {_CACHE_STATS['misses']} misses")
 
 if __name__ == "__main__":
     if not OPENROUTER_API_KEY:
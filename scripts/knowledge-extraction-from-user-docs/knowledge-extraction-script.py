@@ -2,7 +2,8 @@
 
 This script processes diabetes textbooks and medical PDFs for the Diabot knowledge base:
 - Extracts text from PDF documents using PyMuPDF
-- Generates concise summaries using LLaMA 3.3 70B via OpenRouter API
+- Generates concise summaries via OpenRouter, using LLaMA 3.1 8B first and escalating
+  to LLaMA 3.3 70B only for pages the small model handles poorly
 - Processes documents page by page with checkpointing for resumable operations
 - Supports test mode for faster processing of sample pages
 - Outputs structured summaries for ingestion into the ChromaDB vector database
@@ -10,17 +11,25 @@ This script processes diabetes textbooks and medical PDFs for the Diabot knowled
 """
 
 import os
+import re
+import sys
+import logging
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 import fitz  # PyMuPDF
 import requests
-from typing import List, Optional
+from typing import Optional
 import time
 import json
 import argparse
 import pickle
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
 # Always load .env from the script's directory
 dotenv_path = Path(__file__).parent / ".env"
 load_dotenv(dotenv_path)
@@ -33,11 +42,41 @@ _warn_missing_api_key()
 
 # Constants
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
-MODEL_NAME = "meta-llama/llama-3.3-70b-instruct"
+PRIMARY_MODEL = "meta-llama/llama-3.1-8b-instruct"
+ESCALATION_MODEL = "meta-llama/llama-3.3-70b-instruct"
+MIN_CONFIDENT_RESPONSE_CHARS = 80  # shorter non-SKIP answers are re-run on the escalation model
 REQUEST_DELAY = 1  # seconds between API calls
 SKIP_KEYWORD = "[SKIP]"
 CHECKPOINT_FILE = "textbook_processing_checkpoint.pkl"
 OUTPUT_FILE = "textbook_summaries.txt"
+FLUSH_EVERY_PAGES = 10  # fsync output and save checkpoint every N pages
+TEST_MODE_PAGES = 30
+LLM_WORKERS = 10  # concurrent LLM requests (3 in test mode)
+PAGE_QUEUE_SIZE = 32  # extracted pages buffered ahead of the LLM workers
+
+# Cheap pre-LLM filter for front/back matter (TOC, index, references, copyright).
+# A page is only skipped when a textual signal (a heading on its own line, or copyright
+# boilerplate) agrees with a layout signal (mostly digits, or very short lines).
+_BOILERPLATE_HEADING_RE = re.compile(
+    r'^\s*(Index|References|Bibliography|Table of Contents|Contents)\s*$',
+    re.IGNORECASE | re.MULTILINE
+)
+_COPYRIGHT_RE = re.compile(r'\b(ISBN|All rights reserved)\b', re.IGNORECASE)
+BOILERPLATE_HEAD_CHARS = 300  # headings are only checked near the top of the page
+BOILERPLATE_DIGIT_RATIO = 0.25
+BOILERPLATE_MIN_AVG_LINE_LEN = 20
+
+# Single-pass page normalization: drop control chars (keeping \t, \n, \r),
+# map non-breaking/Unicode line separators to spaces, then collapse runs of blanks
+_CTRL_TABLE = {i: None for i in range(32) if i not in (9, 10, 13)} | {0xA0: 0x20, 0x2028: 0x20, 0x2029: 0x20}
+_HSPACE_RE = re.compile(r'[ \t]+')
+
+# Expected summary structure: "[HEADING]" line followed by paragraph text
+_SUMMARY_STRUCTURE_RE = re.compile(r'^\[[^\]\n]+\][ \t]*\n\s*\S')
+
+# Number of successful responses from each model during this run
+model_usage = {PRIMARY_MODEL: 0, ESCALATION_MODEL: 0}
+_model_usage_lock = threading.Lock()
 
 class ProcessingState:
     def __init__(self, total_pages: int, processed_pages: set = None, 
@@ -46,6 +85,7 @@ class ProcessingState:
         self.processed_pages = processed_pages or set()
         self.pages_processed = pages_processed
         self.pages_skipped = pages_skipped
+        self.output_offset = None  # output file size at the last durable checkpoint
         self.start_time = time.time()
         self.last_update = time.time()
     
@@ -103,8 +143,8 @@ def clear_checkpoint(checkpoint_file: str = CHECKPOINT_FILE) -> None:
     except Exception:
         pass
 
-def call_llm(prompt: str) -> Optional[str]:
-    """Call the LLaMA 3.3 70B model via OpenRouter."""
+def call_llm(prompt: str, model: str = PRIMARY_MODEL) -> Optional[str]:
+    """Call the given model via OpenRouter."""
     if not OPENROUTER_API_KEY:
         raise ValueError("OpenRouter API key not found in environment variables")
     
@@ -116,7 +156,7 @@ def call_llm(prompt: str) -> Optional[str]:
     }
     
     data = {
-        "model": MODEL_NAME,
+        "model": model,
         "messages": [
             {
                 "role": "system",
@@ -132,13 +172,8 @@ def call_llm(prompt: str) -> Optional[str]:
     }
     
     try:
-        print("\n" + "="*80)
-        print("SENDING REQUEST TO MODEL:")
-        print(f"Model: {MODEL_NAME}")
-        print("-"*40)
-        print(prompt[:1000] + ("..." if len(prompt) > 1000 else ""))
-        print("-"*40)
-        print(f"Prompt length: {len(prompt)} characters")
+        # %-style args are only formatted when DEBUG is enabled
+        logger.debug("Sending request to %s:\n%.1000s", model, prompt)
         
         response = requests.post(
             "https://openrouter.ai/api/v1/chat/completions",
@@ -149,13 +184,11 @@ def call_llm(prompt: str) -> Optional[str]:
         response.raise_for_status()
         
         result = response.json()["choices"][0]["message"]["content"].strip()
+        # Runs on the LLM worker threads; only successful responses are counted
+        with _model_usage_lock:
+            model_usage[model] = model_usage.get(model, 0) + 1
         
-        print("\nRECEIVED RESPONSE:")
-        print("-"*40)
-        print(result[:1000] + ("..." if len(result) > 1000 else ""))
-        print("-"*40)
-        print(f"Response length: {len(result)} characters")
-        print("="*80 + "\n")
+        logger.debug("Received response from %s:\n%.1000s", model, result)
         
         return result
     except Exception as e:
@@ -164,10 +197,41 @@ def call_llm(prompt: str) -> Optional[str]:
             print(f"Response content: {response.text}")
         return None
 
+def _boilerplate_reason(text: str) -> Optional[str]:
+    """Return why a page is almost certainly TOC/index/reference/copyright matter, or None.
+
+    Either signal alone also matches real content ("glycemic index" in prose, lab-value
+    tables, two-column layouts), so a textual and a layout signal must both be present.
+    """
+    text = text.strip()
+    if not text:
+        return "empty page"
+    heading = _BOILERPLATE_HEADING_RE.search(text[:BOILERPLATE_HEAD_CHARS])
+    textual = (f"'{heading.group(1)}' heading" if heading
+               else "copyright notice" if _COPYRIGHT_RE.search(text) else None)
+    if textual is None:
+        return None
+    if sum(c.isdigit() for c in text) / len(text) > BOILERPLATE_DIGIT_RATIO:
+        return f"{textual} with mostly digits"
+    lines = [line for line in text.splitlines() if line.strip()]
+    if lines and sum(len(line) for line in lines) / len(lines) < BOILERPLATE_MIN_AVG_LINE_LEN:
+        return f"{textual} with very short lines"
+    return None
+
+def _is_skip_response(response: str) -> bool:
+    return response.strip().upper() == SKIP_KEYWORD or 'SKIP' in response.upper()
+
+def _is_low_confidence(response: Optional[str]) -> bool:
+    """Return True if a primary-model summary should be re-run on the escalation model."""
+    if not response:
+        return True
+    response = response.strip()
+    return len(response) < MIN_CONFIDENT_RESPONSE_CHARS or not _SUMMARY_STRUCTURE_RE.match(response)
+
 def process_page(page_text: str, page_num: int) -> str:
     """Process a single page and generate summaries."""
-    # Clean and truncate the page text if too long
-    page_text = page_text.strip()
+    # Normalize, clean and truncate the page text if too long
+    page_text = _HSPACE_RE.sub(' ', page_text.translate(_CTRL_TABLE)).strip()
     if len(page_text) > 4000:  # Leave room for the prompt
         page_text = page_text[:4000] + "... [content truncated]"
     
@@ -192,15 +256,15 @@ Insulin is a hormone produced by the pancreas...
 TEXT TO SUMMARIZE:
 {page_text}"""
     
-    print(f"Page text length: {len(page_text)} characters")
-    print("-" * 80)
-    print("SAMPLE PAGE TEXT:")
-    print(page_text[:500] + ("..." if len(page_text) > 500 else ""))
-    print("-" * 80)
+    logger.debug("Page %d sample text:\n%.500s", page_num, page_text)
     
-    response = call_llm(prompt)
+    # Small model first; its [SKIP] verdicts are accepted as-is
+    response = call_llm(prompt, model=PRIMARY_MODEL)
+    if not (response and _is_skip_response(response)) and _is_low_confidence(response):
+        print(f"Page {page_num}: Low-confidence summary, escalating to {ESCALATION_MODEL}")
+        response = call_llm(prompt, model=ESCALATION_MODEL)
     
-    if not response or response.strip().upper() == SKIP_KEYWORD or 'SKIP' in response.upper():
+    if not response or _is_skip_response(response):
         print(f"Page {page_num}: No relevant content found")
         return f"[PAGE {page_num}]\n{SKIP_KEYWORD}\n"
     
@@ -213,30 +277,63 @@ TEXT TO SUMMARIZE:
     print(f"Page {page_num}: Successfully processed")
     return response
 
-def extract_text_from_pdf(pdf_path: str) -> List[str]:
-    """Extract text from each page of the PDF."""
-    print(f"Opening PDF file: {pdf_path}")
-    try:
-        doc = fitz.open(pdf_path)
-        pages = []
-        total_pages = len(doc)
-        print(f"Found {total_pages} pages in the PDF")
-        
-        for page_num in range(total_pages):
+class PdfPageSource:
+    """Lazy page-text source backed by a single cached PyMuPDF document handle."""
+
+    def __init__(self, pdf_path: str, limit: Optional[int] = None):
+        self.pdf_path = pdf_path
+        self.limit = limit
+        self._doc = None
+
+    @property
+    def doc(self):
+        if self._doc is None:
+            print(f"Opening PDF file: {self.pdf_path}")
             try:
-                page = doc.load_page(page_num)
-                text = page.get_text("text")
-                if not text.strip():
-                    print(f"Warning: Page {page_num + 1} appears to be empty")
-                pages.append(text)
+                self._doc = fitz.open(self.pdf_path)
             except Exception as e:
-                print(f"Error extracting text from page {page_num + 1}: {str(e)}")
-                pages.append("")  # Add empty string for failed pages
-        
-        return pages
-    except Exception as e:
-        print(f"Error opening PDF file: {str(e)}")
-        raise
+                print(f"Error opening PDF file: {str(e)}")
+                raise
+            print(f"Found {len(self._doc)} pages in the PDF")
+        return self._doc
+
+    def __len__(self) -> int:
+        total = len(self.doc)
+        return min(total, self.limit) if self.limit else total
+
+    def get_text(self, index: int) -> str:
+        """Extract the text of a single 0-indexed page ("" if extraction fails)."""
+        try:
+            text = self.doc.load_page(index).get_text("text")
+            if not text.strip():
+                print(f"Warning: Page {index + 1} appears to be empty")
+            return text
+        except Exception as e:
+            print(f"Error extracting text from page {index + 1}: {str(e)}")
+            return ""
+
+    def close(self) -> None:
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+
+async def _produce_pages(source: PdfPageSource, state: ProcessingState,
+                         queue: asyncio.Queue, num_workers: int) -> None:
+    """Extract pages not yet processed in a worker thread and queue them."""
+    loop = asyncio.get_running_loop()
+    for index in range(state.total_pages):
+        if index in state.processed_pages:
+            print(f"Skipping already processed page {index + 1}")
+            continue
+        page_text = await loop.run_in_executor(None, source.get_text, index)
+        await queue.put((index + 1, page_text))
+    # One sentinel per consumer
+    for _ in range(num_workers):
+        await queue.put(None)
+
+async def _consume_pages(queue: asyncio.Queue, handle_page) -> None:
+    while (item := await queue.get()) is not None:
+        await handle_page(*item)
 
 def chunk_text(text: str) -> list:
     """Split text into chunks based on the separator."""
@@ -271,16 +368,22 @@ def process_textbook(pdf_path: str, output_file: str, test_mode: bool = False,
         resume: If True, resume from checkpoint if available
         clear: If True, clear existing checkpoint and start fresh
     """
+    source = PdfPageSource(pdf_path, limit=TEST_MODE_PAGES if test_mode else None)
+    try:
+        _process_textbook(source, pdf_path, output_file, test_mode, resume, clear)
+    finally:
+        source.close()
+
+def _process_textbook(source: PdfPageSource, pdf_path: str, output_file: str,
+                      test_mode: bool, resume: bool, clear: bool):
     # Handle checkpoint clearing
     if clear:
         clear_checkpoint()
         print("Checkpoint cleared. Starting fresh processing.")
         # Always start with a fresh state and overwrite output file
-        all_pages = extract_text_from_pdf(pdf_path)
+        total_pages = len(source)
         if test_mode:
-            all_pages = all_pages[:30]
-            print(f"TEST MODE: Processing first 30 pages in batches of 3")
-        total_pages = len(all_pages)
+            print(f"TEST MODE: Processing first {TEST_MODE_PAGES} pages in batches of 3")
         state = ProcessingState(total_pages=total_pages)
         # Always open output file in write mode and write header below
         resume = False
@@ -288,7 +391,6 @@ def process_textbook(pdf_path: str, output_file: str, test_mode: bool = False,
         checkpoint_output = None
     else:
         # Load checkpoint if resuming
-        all_pages = None
         state, checkpoint_output, has_checkpoint = load_checkpoint()
         if resume and has_checkpoint and state:
             if checkpoint_output == output_file:
@@ -300,17 +402,14 @@ def process_textbook(pdf_path: str, output_file: str, test_mode: bool = False,
                 print("Starting fresh processing...")
                 state = None
         if not state:
-            print(f"Extracting text from {pdf_path}...")
-            all_pages = extract_text_from_pdf(pdf_path)
+            total_pages = len(source)
             if test_mode:
-                all_pages = all_pages[:30]  # First 30 pages for testing
-                print(f"TEST MODE: Processing first 30 pages in batches of 3")
-            total_pages = len(all_pages)
+                print(f"TEST MODE: Processing first {TEST_MODE_PAGES} pages in batches of 3")
             state = ProcessingState(total_pages=total_pages)
             print(f"Starting new processing session with {total_pages} pages")
 
     
-    batch_size = 3 if test_mode else 1
+    num_workers = 3 if test_mode else LLM_WORKERS
     print(f"Found {state.total_pages} pages to process{' (test mode)' if test_mode else ''}.")
     
     # Create output directory if it doesn't exist
@@ -325,82 +424,130 @@ def process_textbook(pdf_path: str, output_file: str, test_mode: bool = False,
         mode = 'w'
     else:
         mode = 'a'
+        # Drop anything written after the last durable checkpoint; those pages are redone
+        output_offset = getattr(state, 'output_offset', None)
+        if output_exists and output_offset is not None and os.path.getsize(output_file) > output_offset:
+            os.truncate(output_file, output_offset)
+    boilerplate_pages = []  # reported at the end so pages dropped before the LLM stay visible
     with open(output_file, mode, encoding='utf-8') as f:
+        pages_since_flush = 0
+
+        def commit() -> None:
+            """Flush output to disk, then checkpoint the state matching it."""
+            nonlocal pages_since_flush
+            f.flush()
+            os.fsync(f.fileno())
+            state.output_offset = os.fstat(f.fileno()).st_size
+            save_checkpoint(state, output_file)
+            pages_since_flush = 0
+
+        def page_done() -> None:
+            nonlocal pages_since_flush
+            pages_since_flush += 1
+            if pages_since_flush >= FLUSH_EVERY_PAGES:
+                commit()
+
+        def checkpoint_page() -> None:
+            """page_done() for a page whose state is already updated; a failed save must not
+            reach handle_page's error path, which would record the page a second time."""
+            try:
+                page_done()
+            except Exception as e:
+                print(f"Warning: Failed to save checkpoint: {str(e)}")
+
+        # Consumers finish pages out of order; results are buffered and written in page order,
+        # so the output stays ordered and processed_pages/output_offset always cover a prefix
+        next_page_to_write = 0  # index of the first page whose result isn't written yet
+        pending = {}  # page index -> (text to write or None, was_skipped)
+
+        def finish_page(index: int, text: Optional[str], was_skipped: bool) -> None:
+            """Buffer a page's result, then write and record every page before the first one still in flight."""
+            nonlocal next_page_to_write
+            pending[index] = (text, was_skipped)
+            while next_page_to_write < state.total_pages:
+                if next_page_to_write in pending:
+                    text, was_skipped = pending[next_page_to_write]
+                    if text:
+                        f.write(text)
+                    del pending[next_page_to_write]
+                    state.update(next_page_to_write, was_skipped=was_skipped)
+                    checkpoint_page()
+                elif next_page_to_write not in state.processed_pages:
+                    break  # still being summarized
+                next_page_to_write += 1
+
         if mode == 'w':
             f.write(f"# DIABETES_TEXTBOOK_SUMMARIES\n")
             f.write(f"SOURCE: {os.path.basename(pdf_path)}\n")
             f.write(f"GENERATED: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
             f.write(f"FORMAT_VERSION: 1.0\n\n")
         
-        # Process pages
-        for page_num in range(1, state.total_pages + 1):
-            # Skip already processed pages when resuming
-            if page_num - 1 in state.processed_pages:  # -1 because pages are 1-indexed in display
-                print(f"Skipping already processed page {page_num}")
-                continue
-                
+        async def handle_page(page_num: int, page_text: str) -> None:
             try:
-                # Only load all_pages if we haven't already
-                if all_pages is None:
-                    all_pages = extract_text_from_pdf(pdf_path)
-                    if test_mode:
-                        all_pages = all_pages[:30]
-                        
-                page_text = all_pages[page_num - 1]  # -1 because list is 0-indexed
-                
                 # Skip empty or minimal content pages
                 if not page_text.strip() or len(page_text.strip()) < 50:
                     print(f"Page {page_num}: Empty or minimal content, skipping...")
-                    state.update(page_num - 1, was_skipped=True)
-                    save_checkpoint(state, output_file)
-                    continue
+                    finish_page(page_num - 1, None, was_skipped=True)
+                    return
+
+                # Skip TOC/index/reference/copyright pages without calling the LLM
+                boilerplate = _boilerplate_reason(page_text)
+                if boilerplate:
+                    print(f"Page {page_num}: Boilerplate content ({boilerplate}), skipping...")
+                    boilerplate_pages.append(page_num)
+                    finish_page(page_num - 1, None, was_skipped=True)
+                    return
                     
                 print(f"\nProcessing page {page_num}...")
-                summary = process_page(page_text, page_num)
+                summary = await asyncio.get_running_loop().run_in_executor(
+                    llm_executor, process_page, page_text, page_num)
                 
                 # Only write if we have a valid summary (not SKIP)
+                output = None
                 if summary and summary.strip() != f"[PAGE {page_num}]\n{SKIP_KEYWORD}\n":
                     # Remove the [PAGE X] line and any extra newlines
                     summary_lines = summary.split('\n')[1:]  # Skip the [PAGE X] line
                     cleaned_summary = '\n'.join(line for line in summary_lines if line.strip() != SKIP_KEYWORD)
                     
                     if cleaned_summary.strip():
-                        f.write(cleaned_summary.strip() + '\n')
-                        f.write('----\n')
-                        f.flush()
-                        state.update(page_num - 1, was_skipped=False)
-                    else:
-                        state.update(page_num - 1, was_skipped=True)
-                else:
-                    state.update(page_num - 1, was_skipped=True)
-                    
-                print(f"Completed {len(state.processed_pages)}/{state.total_pages} pages")
+                        output = cleaned_summary.strip() + '\n----\n'
                 
-                # Save checkpoint after each successful page
-                try:
-                    save_checkpoint(state, output_file)
-                    print(f"Checkpoint saved after page {page_num}")
-                except Exception as e:
-                    print(f"Warning: Failed to save checkpoint: {str(e)}")
+                # Written once every earlier page is; flushes and saves a checkpoint every FLUSH_EVERY_PAGES pages
+                finish_page(page_num - 1, output, was_skipped=output is None)
+                print(f"Completed {len(state.processed_pages)}/{state.total_pages} pages")
                 
                 # Add delay between batches in test mode
                 if test_mode and page_num % 3 == 0:
                     print(f"Test mode: Waiting {REQUEST_DELAY} seconds before next batch...")
-                    time.sleep(REQUEST_DELAY)
+                    await asyncio.sleep(REQUEST_DELAY)
                 
-            except KeyboardInterrupt:
-                print("\nProcessing interrupted by user. Saving progress...")
-                save_checkpoint(state, output_file)
-                print(f"Progress saved. You can resume later with --resume")
-                return
             except Exception as e:
                 print(f"Error processing page {page_num}: {str(e)}")
                 try:
-                    state.update(page_num - 1, was_skipped=True)
-                    save_checkpoint(state, output_file)
+                    if page_num - 1 not in pending and page_num - 1 not in state.processed_pages:
+                        finish_page(page_num - 1, None, was_skipped=True)
+                    commit()
                     print(f"Checkpoint updated after error on page {page_num}")
                 except Exception as save_error:
                     print(f"Critical: Failed to save checkpoint after error: {str(save_error)}")
+
+        async def run_pipeline() -> None:
+            # PDF extraction (producer) overlaps with LLM summarization (consumers)
+            queue = asyncio.Queue(maxsize=PAGE_QUEUE_SIZE)
+            await asyncio.gather(
+                _produce_pages(source, state, queue, num_workers),
+                *(_consume_pages(queue, handle_page) for _ in range(num_workers))
+            )
+
+        # Process pages
+        with ThreadPoolExecutor(max_workers=num_workers) as llm_executor:
+            try:
+                asyncio.run(run_pipeline())
+            except KeyboardInterrupt:
+                print("\nProcessing interrupted by user. Saving progress...")
+                commit()
+                print(f"Progress saved. You can resume later with --resume")
+                return
         
         # Add summary of processing if not in test mode
         if not test_mode:
@@ -418,6 +565,10 @@ def process_textbook(pdf_path: str, output_file: str, test_mode: bool = False,
     
     print(f"\nProcessing complete! Summaries saved to {output_file}")
     print(f"Pages processed: {state.pages_processed}, Pages skipped: {state.pages_skipped}")
+    if boilerplate_pages:
+        print(f"Skipped as boilerplate: pages {', '.join(map(str, sorted(boilerplate_pages)))}")
+    print(f"Model responses: {PRIMARY_MODEL}={model_usage[PRIMARY_MODEL]}, "
+          f"{ESCALATION_MODEL}={model_usage[ESCALATION_MODEL]}")
     if test_mode:
         print("\nTest mode completed. To process the full document, run without --test flag.")
 
@@ -461,7 +612,7 @@ def parse_summaries_file(filepath: str) -> list:
 if __name__ == "__main__":
     import argparse
     
-    parser = argparse.ArgumentParser(description='Process a diabetes textbook and generate summaries using LLaMA 3.3 70B.')
+    parser = argparse.ArgumentParser(description='Process a diabetes textbook and generate summaries using LLaMA 3.1 8B with LLaMA 3.3 70B escalation.')
     parser.add_argument('--status', action='store_true', help='Show current processing status and exit')
     parser.add_argument('pdf_path', nargs='?', type=str, help='Path to the PDF file to process')
     parser.add_argument('--output', type=str, default=OUTPUT_FILE, 
@@ -474,9 +625,17 @@ if __name__ == "__main__":
                        help='Resume from last checkpoint if available')
     parser.add_argument('--clear', action='store_true',
                        help='Clear existing checkpoint and start fresh')
+    parser.add_argument('--debug', action='store_true',
+                       help='Log prompts and model responses')
     
     args = parser.parse_args()
 
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO,
+                        format='%(message)s')
+    # Block-buffer stdout when piped (e.g. PythonShell) instead of a syscall per line
+    if not sys.stdout.isatty():
+        sys.stdout.reconfigure(line_buffering=False)
+
     # Handle --status flag
     if args.status:
         show_status()
@@ -1,16 +1,22 @@
 import os
-import re
 import torch
+import numpy as np
 import chromadb
 import json
 import time
+import asyncio
+import hashlib
+import queue
+import threading
 import sys
 import subprocess
-import pdfplumber
-from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+import pypdfium2 as pdfium
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Iterable, NamedTuple
 from sentence_transformers import SentenceTransformer
-from dataclasses import dataclass, field
+from dataclasses import dataclass, asdict
 from tqdm import tqdm
 from pathlib import Path
 
@@ -39,6 +45,41 @@ def print_warning(message):
 def print_success(message):
     print(f"[SUCCESS] {message}")
 
+# ChromaDB server connection, shared by the sync and async clients
+CHROMA_CONNECTION = {
+    "host": "localhost",
+    "port": 8000,
+    "ssl": False,
+    "headers": {"Authorization": "Bearer test-token"}
+}
+CHROMA_UPSERT_CONCURRENCY = 4  # in-flight upsert requests
+CHROMA_BATCH_SIZE = 500  # records per upsert request
+UPSERT_RETRY_BACKOFF = 0.1  # seconds; doubled after every failed attempt
+EMBEDDING_QUEUE_SIZE = 4  # encoded batches buffered ahead of the uploader
+CHUNK_TOKENS = 480  # tokens per chunk (bge max_seq_length is 512 incl. special tokens)
+CHUNK_OVERLAP_TOKENS = 40
+CHUNK_SNAP_TOKENS = 8  # max tokens a window edge may move to land on a word boundary
+
+RAG_SOURCES_DIR = Path(__file__).parent.parent / "data" / "rag_sources"
+
+_NUL_TABLE = {0: None}  # drop NUL bytes that some PDFs embed in text runs
+
+_worker_pdf = None  # per-process document handle (pdfium objects don't pickle)
+
+def _init_extract_worker(pdf_path: str) -> None:
+    """Open the PDF once per worker process instead of once per page."""
+    global _worker_pdf
+    _worker_pdf = pdfium.PdfDocument(pdf_path)
+
+def _extract_page(page_idx: int) -> Tuple[int, str]:
+    """Extract the text of one page in a worker process."""
+    page = _worker_pdf[page_idx]
+    textpage = page.get_textpage()
+    text = textpage.get_text_range().replace("\r\n", "\n").translate(_NUL_TABLE).strip()
+    textpage.close()
+    page.close()
+    return page_idx + 1, text
+
 @dataclass
 class DocumentMetadata:
     part: str = ""
@@ -47,19 +88,88 @@ class DocumentMetadata:
     chapter_title: str = ""
     page_number: Optional[int] = None
 
-@dataclass
-class DocumentChunk:
+class DocumentChunk(NamedTuple):
     text: str
-    metadata: Dict[str, Any]
-    document_metadata: DocumentMetadata
+    metadata: Dict[str, Any]  # flat: chunk fields followed by the DocumentMetadata fields
     id: str
 
+class OnnxEncoder:
+    """ONNX Runtime (optimum) drop-in for the subset of SentenceTransformer.encode used here.
+    
+    Uses CLS pooling, matching the BGE sentence-transformers configuration. With
+    tensorrt=True (CUDA only) ONNX Runtime runs the graph through TensorRT in FP16.
+    """
+    def __init__(self, model_name: str, onnx_dir: str, device: str, max_seq_length: int = 512,
+                 tensorrt: bool = False, max_batch_size: int = 256):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+        
+        provider = "CUDAExecutionProvider" if device == "cuda" else "CPUExecutionProvider"
+        provider_options = None
+        if tensorrt and device == "cuda":
+            provider = "TensorrtExecutionProvider"
+            inputs = ("input_ids", "attention_mask", "token_type_ids")
+            profile = lambda shape: ",".join(f"{name}:{shape}" for name in inputs)
+            provider_options = {
+                "trt_fp16_enable": True,
+                # Engines take minutes to build; reuse them across runs
+                "trt_engine_cache_enable": True,
+                "trt_engine_cache_path": os.path.join(onnx_dir, "trt_cache"),
+                # One profile spanning every batch/sequence shape, so padded lengths never trigger a rebuild
+                "trt_profile_min_shapes": profile("1x1"),
+                "trt_profile_opt_shapes": profile(f"{max_batch_size}x{max_seq_length}"),
+                "trt_profile_max_shapes": profile(f"{max_batch_size}x{max_seq_length}")
+            }
+        
+        if os.path.exists(os.path.join(onnx_dir, "model.onnx")):
+            self.model = ORTModelForFeatureExtraction.from_pretrained(onnx_dir, provider=provider,
+                                                                      provider_options=provider_options)
+            self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        else:
+            print_info(f"Exporting {model_name} to ONNX (one-time): {onnx_dir}")
+            self.model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True, provider=provider,
+                                                                      provider_options=provider_options)
+            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+            self.model.save_pretrained(onnx_dir)
+            self.tokenizer.save_pretrained(onnx_dir)
+        self.max_seq_length = max_seq_length
+    
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = True, **kwargs) -> np.ndarray:
+        # Length-sorted batches, restored to input order at the end
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        out = None
+        for start in tqdm(range(0, len(texts), batch_size), disable=not show_progress_bar, desc="Batches"):
+            idx = order[start:start + batch_size]
+            enc = self.tokenizer([texts[i] for i in idx], padding=True, truncation=True,
+                                 max_length=self.max_seq_length, return_tensors="pt")
+            with torch.inference_mode():
+                emb = self.model(**enc).last_hidden_state[:, 0]
+            if normalize_embeddings:
+                emb = torch.nn.functional.normalize(emb, p=2, dim=1)
+            emb = emb.cpu().float().numpy()
+            if out is None:
+                out = np.empty((len(texts), emb.shape[1]), dtype=np.float32)
+            out[idx] = emb
+        return out if out is not None else np.empty((0, 0), dtype=np.float32)
+
 class TextbookProcessor:
-    def __init__(self, pdf_path: str, model_name: str = "BAAI/bge-large-en-v1.5"):
+    def __init__(self, pdf_path: str, model_name: str = "BAAI/bge-large-en-v1.5", backend: str = "torch",
+                 compile_model: bool = False):
+        # Variable-length batches fragment the CUDA caching allocator; must be set before CUDA init
+        os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True,max_split_size_mb:128")
         self.start_time = time.time()
         self.pdf_path = pdf_path
+        self._source = os.path.basename(pdf_path)
         self.model_name = model_name
+        self.backend = backend
+        self.compile_model = compile_model
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        # BF16 keeps FP32's exponent range on Ampere+ (SM80); older GPUs, which only emulate BF16, use FP16
+        if self.device == "cuda":
+            self.dtype = torch.bfloat16 if torch.cuda.get_device_capability(0) >= (8, 0) else torch.float16
+        else:
+            self.dtype = torch.float32
         
         # Create models directory if it doesn't exist
         self.models_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
@@ -74,12 +184,29 @@ class TextbookProcessor:
             print_info(f"CUDA version: {torch.version.cuda}")
             print_info(f"PyTorch version: {torch.__version__}")
         
-        # Initialize the embedding model
-        self._init_embedding_model()
+        # Use every core for CPU inference. torch is already imported, so OMP_NUM_THREADS /
+        # MKL_NUM_THREADS would be ignored here; set the intra-op pool size directly
+        if self.device == "cpu":
+            num_threads = os.cpu_count() or 1
+            torch.set_num_threads(num_threads)
+            try:
+                torch.set_num_interop_threads(2)
+            except RuntimeError:
+                pass  # only settable once, before any inter-op parallel work has started
+            print_info(f"CPU threads: {num_threads}")
+        
+        # The embedding model is loaded on first use (see _ensure_embedding_model), so a cached
+        # run never loads it and the page extraction workers start before CUDA is initialized
+        self.embedding_model = None
         
         # Initialize ChromaDB
         self._init_chromadb()
     
+    def _ensure_embedding_model(self):
+        """Load the embedding model if it hasn't been loaded yet."""
+        if self.embedding_model is None:
+            self._init_embedding_model()
+    
     def _init_embedding_model(self):
         """Initialize the embedding model with local cache and optimization settings."""
         print_info(f"Loading embedding model: {self.model_name}")
@@ -89,28 +216,49 @@ class TextbookProcessor:
         model_path = os.path.join(self.models_dir, 'BAAI_bge-large-en-v1.5')
         os.makedirs(model_path, exist_ok=True)
         
+        if self.backend in ("onnx", "tensorrt"):
+            self.embedding_model = OnnxEncoder(self.model_name, os.path.join(self.models_dir, 'bge_onnx'), self.device,
+                                               tensorrt=self.backend == "tensorrt")
+            print_success(f"ONNX model loaded in {time.time() - model_load_start:.2f} seconds")
+            return
+        
         try:
             # Enable TF32 for faster matrix multiplications on Ampere GPUs
             torch.backends.cuda.matmul.allow_tf32 = True
             torch.backends.cudnn.allow_tf32 = True
             
-            # Load the model with explicit configuration and optimizations
-            self.embedding_model = SentenceTransformer(
-                self.model_name,
-                device=self.device,
-                cache_folder=model_path,
-                trust_remote_code=True,
-                device_map='auto'  # Automatically handle model distribution
-            )
+            # Load straight onto self.device: bge-large fits on one device and ships no custom code,
+            # so accelerate's device_map dispatch hooks and trust_remote_code only add overhead
+            try:
+                self.embedding_model = SentenceTransformer(
+                    self.model_name,
+                    device=self.device,
+                    cache_folder=model_path,
+                    model_kwargs={"attn_implementation": "sdpa"}  # fused scaled-dot-product attention
+                )
+            except TypeError as e:
+                # sentence-transformers < 3.0 has no model_kwargs; load with the default attention
+                print_warning(f"SDPA attention unavailable ({e}), loading with default attention")
+                self.embedding_model = SentenceTransformer(
+                    self.model_name,
+                    device=self.device,
+                    cache_folder=model_path
+                )
             
             # Optimize model settings
             self.embedding_model.max_seq_length = 512
-            self.embedding_model = self.embedding_model.half()  # Use mixed precision
+            if self.device == "cuda":
+                self.embedding_model = self.embedding_model.to(self.dtype)  # half-precision weights on GPU
             self.embedding_model.eval()  # Set to evaluation mode
+            self._optimize_model()
             
-            # Warm up the model
-            with torch.no_grad():
-                _ = self.embedding_model.encode(['warmup'])
+            # Warm up the model; when compiled, also trace the longest shape up front
+            warmup_texts = [['warmup']]
+            if self.compile_model:
+                warmup_texts.append(['warmup ' * self.embedding_model.max_seq_length] * 8)
+            with self._inference_context():
+                for texts in warmup_texts:
+                    _ = self.embedding_model.encode(texts)
             
             print_success(f"Model loaded in {time.time() - model_load_start:.2f} seconds")
             
@@ -138,45 +286,95 @@ class TextbookProcessor:
             # Try loading again
             self.embedding_model = SentenceTransformer(
                 model_path,
-                device=self.device,
-                trust_remote_code=True
+                device=self.device
             )
             self.embedding_model.max_seq_length = 512
+            if self.device == "cuda":
+                self.embedding_model = self.embedding_model.to(self.dtype)
+            self.embedding_model.eval()
             print_success("Successfully loaded model after download")
             
         except Exception as e:
             print_error(f"Failed to download model: {str(e)}")
             raise RuntimeError("Could not load or download the embedding model.")
     
+    def _optimize_model(self):
+        """Ensure fused attention (SDPA, else BetterTransformer); optionally torch.compile, with FP8 linears on SM89+."""
+        transformer = self.embedding_model[0]
+        if getattr(transformer.auto_model.config, "_attn_implementation", None) == "sdpa":
+            print_info("Using SDPA fused attention")
+        else:
+            try:
+                from optimum.bettertransformer import BetterTransformer
+                transformer.auto_model = BetterTransformer.transform(transformer.auto_model)
+                print_info("Using BetterTransformer fused attention")
+            except Exception as e:
+                print_warning(f"BetterTransformer not applied, using default attention: {str(e)}")
+        
+        # Ada/Hopper have FP8 tensor cores; per-tensor dynamic W8A8 keeps embedding fidelity. Only
+        # worth it compiled: eagerly, the per-call quantize/dequantize costs more than it saves.
+        # torchao is optional, so a missing install just keeps self.dtype
+        if self.compile_model and self.device == "cuda" and torch.cuda.get_device_capability(0) >= (8, 9):
+            try:
+                from torchao.quantization import quantize_, Float8DynamicActivationFloat8WeightConfig, PerTensor
+                quantize_(transformer.auto_model, Float8DynamicActivationFloat8WeightConfig(granularity=PerTensor()))
+                print_info("Quantized linear layers to FP8 (torchao)")
+            except Exception as e:
+                print_warning(f"FP8 quantization not applied, using {self.dtype}: {str(e)}")
+        
+        if self.compile_model:
+            try:
+                # dynamic=True avoids a recompile for every new padded sequence length
+                transformer.auto_model = torch.compile(transformer.auto_model, mode="reduce-overhead", dynamic=True)
+                print_info("Compiled transformer with torch.compile")
+            except Exception as e:
+                print_warning(f"torch.compile failed, running eagerly: {str(e)}")
+    
+    @contextmanager
+    def _inference_context(self):
+        """Grad-free inference, with half-precision autocast when running on CUDA."""
+        with torch.inference_mode(), torch.autocast(
+            device_type="cuda", dtype=self.dtype, enabled=self.device == "cuda"
+        ):
+            yield
+    
+    @contextmanager
+    def _multi_gpu_pool(self):
+        """Yield a sentence-transformers multi-process pool spanning every GPU, or None on a single device."""
+        # Compiled models don't pickle to the worker processes, so they stay on one GPU
+        if self.backend != "torch" or self.compile_model or torch.cuda.device_count() < 2:
+            yield None
+            return
+        try:
+            pool = self.embedding_model.start_multi_process_pool()
+        except Exception as e:
+            print_warning(f"Multi-GPU pool unavailable, encoding on one GPU: {str(e)}")
+            yield None
+            return
+        print_info(f"Encoding on {len(pool['processes'])} GPUs")
+        try:
+            yield pool
+        finally:
+            self.embedding_model.stop_multi_process_pool(pool)
+    
     def _init_chromadb(self):
         """Initialize ChromaDB client and collection."""
         print_info("Initializing ChromaDB client")
-        self.client = chromadb.HttpClient(
-            host='localhost',
-            port=8000,
-            ssl=False,
-            headers={'Authorization': 'Bearer test-token'}
-        )
+        self.client = chromadb.HttpClient(**CHROMA_CONNECTION)
         print_info("Connected to ChromaDB server")
         
-        # Get or create collection
+        # Recreate the collection: dropping it is O(1), unlike a delete-all scan
         self.collection_name = "diabetes_textbook"
-        try:
-            self.collection = self.client.get_collection(name=self.collection_name)
-            print_info(f"Using existing collection: {self.collection_name}")
-            self._clear_collection()
-        except Exception:
-            self._create_collection()
+        self._clear_collection()
+        self._create_collection()
     
     def _clear_collection(self):
-        """Clear existing data from the collection."""
-        print_info("Clearing existing data from the collection...")
+        """Drop the existing collection, if any."""
         try:
-            self.collection.delete(where={"$exists": True})
-            print_success(f"Cleared existing data from collection: {self.collection_name}")
-        except Exception as e:
-            print_error(f"Error clearing collection: {str(e)}")
-            print_info("Continuing with insert...")
+            self.client.delete_collection(name=self.collection_name)
+            print_success(f"Dropped existing collection: {self.collection_name}")
+        except Exception:
+            print_info(f"No existing collection to clear: {self.collection_name}")
     
     def _create_collection(self):
         """Create a new ChromaDB collection."""
@@ -187,16 +385,14 @@ class TextbookProcessor:
         )
         print_success(f"Created new collection: {self.collection_name}")
     
-    def load_metadata(self) -> Tuple[Dict, Dict]:
+    def load_metadata(self) -> Tuple[Tuple[np.ndarray, np.ndarray, List[Dict]], Dict]:
         """Load and parse the metadata JSON files."""
-        base_dir = Path(__file__).parent.parent / "data" / "rag_sources"
-        
         # Load chapters metadata
-        with open(base_dir / "chapters-distribution.json", 'r', encoding='utf-8') as f:
+        with open(RAG_SOURCES_DIR / "chapters-distribution.json", 'r', encoding='utf-8') as f:
             chapters_data = json.load(f)
         
         # Load parts metadata
-        with open(base_dir / "parts-distribution.json", 'r', encoding='utf-8') as f:
+        with open(RAG_SOURCES_DIR / "parts-distribution.json", 'r', encoding='utf-8') as f:
             parts_data = json.load(f)
         
         # Create mappings
@@ -205,29 +401,39 @@ class TextbookProcessor:
             part_num = part["part"].split()[1]
             part_title_map[part_num] = part["part"]
         
-        # Create page to chapter mapping
-        page_chapter_map = {}
+        # Page to chapter mapping as sorted chapter intervals: (start pages, end pages, records)
+        starts, ends, records = [], [], []
         for chapter in chapters_data:
             try:
                 start_page, end_page = map(int, chapter["page_range"].split('-'))
                 part_num = chapter["part"].split()[1]
                 
-                for page in range(start_page, end_page + 1):
-                    page_chapter_map[page] = {
-                        "part": chapter["part"],
-                        "part_title": part_title_map.get(part_num, ""),
-                        "chapter": chapter["chapter"],
-                        "chapter_title": chapter["title"]
-                    }
+                records.append({
+                    "part": chapter["part"],
+                    "part_title": part_title_map.get(part_num, ""),
+                    "chapter": chapter["chapter"],
+                    "chapter_title": chapter["title"]
+                })
+                starts.append(start_page)
+                ends.append(end_page)
             except (ValueError, IndexError, KeyError) as e:
                 print_warning(f"Error processing chapter {chapter.get('chapter')}: {e}")
                 continue
         
+        order = np.argsort(starts, kind="stable")
+        page_chapter_map = (
+            np.asarray(starts, dtype=np.int32)[order],
+            np.asarray(ends, dtype=np.int32)[order],
+            [records[i] for i in order]
+        )
         return page_chapter_map, part_title_map
     
-    def get_metadata_for_page(self, page_number: int, page_chapter_map: Dict) -> DocumentMetadata:
-        """Get metadata for a specific page number."""
-        metadata = page_chapter_map.get(page_number, {})
+    def get_metadata_for_page(self, page_number: int,
+                              page_chapter_map: Tuple[np.ndarray, np.ndarray, List[Dict]]) -> DocumentMetadata:
+        """Get metadata for a specific page number (binary search over chapter start pages)."""
+        starts, ends, records = page_chapter_map
+        idx = int(np.searchsorted(starts, page_number, side="right")) - 1
+        metadata = records[idx] if idx >= 0 and page_number <= ends[idx] else {}
         return DocumentMetadata(
             part=metadata.get("part", ""),
             part_title=metadata.get("part_title", ""),
@@ -237,7 +443,11 @@ class TextbookProcessor:
         )
     
     def extract_text_with_metadata(self, test_mode: bool = False) -> List[DocumentChunk]:
-        """Extract text and metadata from PDF using the new chunking approach."""
+        """Extract text and metadata from PDF as overlapping token-budgeted chunks.
+        
+        Pages are tokenized into a single running stream so chunks can span page
+        breaks; each chunk carries the metadata of the page it starts on.
+        """
         print_step("Starting PDF Processing with Enhanced Chunking")
         print_info(f"PDF: {self.pdf_path}")
         print_info(f"File size: {os.path.getsize(self.pdf_path) / (1024*1024):.2f} MB")
@@ -248,196 +458,357 @@ class TextbookProcessor:
         chunks = []
         chunk_id = 0
         total_pages = 0
-        start_time = time.time()
         
-        # Get total pages for progress tracking
-        with pdfplumber.open(self.pdf_path) as pdf:
-            total_pages = len(pdf.pages)
-            if test_mode:
-                total_pages = min(10, total_pages)
-                print_info(f"Found {total_pages} pages (test mode)")
-            else:
-                print_info(f"Found {total_pages} pages in the document")
+        pdf = pdfium.PdfDocument(self.pdf_path)
+        total_pages = len(pdf)
+        pdf.close()
+        if test_mode:
+            total_pages = min(10, total_pages)
+            print_info(f"Found {total_pages} pages (test mode)")
+        else:
+            print_info(f"Found {total_pages} pages in the document")
         
-        # Process pages
-        with pdfplumber.open(self.pdf_path) as pdf:
-            pages_to_process = pdf.pages[:total_pages]
+        # Extract page text in parallel worker processes and tokenize each page as it
+        # arrives into one running token stream; offsets index into full_text
+        text_parts = []
+        token_offsets = []  # (start, end) character span of every token in full_text
+        token_pages = []    # page number of every token
+        text_len = 0
+        # Extraction is CPU-bound, so more workers than cores only adds contention (and, under
+        # spawn/forkserver, another interpreter re-importing this script's dependencies)
+        max_workers = max(1, min(os.cpu_count() or 1, total_pages))
+        # ~4 tasks per worker keeps IPC round-trips low while still balancing uneven pages
+        chunksize = max(1, min(64, total_pages // (max_workers * 4)))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_extract_worker,
+                                 initargs=(self.pdf_path,)) as executor:
+            # map submits every page up front, so the workers start (and extract) before the
+            # model is loaded here; the tokenizer is needed only once results are consumed
+            pages = executor.map(_extract_page, range(total_pages), chunksize=chunksize)
+            self._ensure_embedding_model()
+            tokenizer = self.embedding_model.tokenizer
             page_iterator = tqdm(
-                enumerate(pages_to_process, 1), 
-                desc="Processing pages", 
+                pages,
+                desc="Processing pages",
                 total=total_pages
             )
             
-            for page_num, page in page_iterator:
-                page_start_time = time.time()
-                text = page.extract_text() or ""
+            for page_num, text in page_iterator:
                 if not text:
-                    print_warning(f"Page {page_num} has no extractable text")
+                    tqdm.write(f"[WARNING] Page {page_num} has no extractable text")
                     continue
                 
-                # Get metadata for this page
-                doc_metadata = self.get_metadata_for_page(page_num, page_chapter_map)
+                if text_parts:
+                    text_parts.append("\n")
+                    text_len += 1
+                encoding = tokenizer(text, return_offsets_mapping=True, add_special_tokens=False)
+                page_offsets = encoding["offset_mapping"]
+                token_offsets.extend((text_len + start, text_len + end) for start, end in page_offsets)
+                token_pages.extend(repeat(page_num, len(page_offsets)))
+                text_parts.append(text)
+                text_len += len(text)
                 
-                # Update progress
-                page_iterator.set_postfix({
-                    'chunks': len(chunks),
-                    'time': f"{time.time() - start_time:.1f}s"
-                }, refresh=False)
-                
-                # Create chunks with metadata
-                chunk_size = 500  # characters per chunk
-                for i in range(0, len(text), chunk_size):
-                    chunk_text = text[i:i + chunk_size].strip()
-                    if not chunk_text:
-                        continue
-                    
-                    chunk_metadata = {
-                        "source": os.path.basename(self.pdf_path),
+                if page_num % 50 == 0:
+                    page_iterator.set_postfix(tokens=len(token_offsets), refresh=False)
+        
+        full_text = "".join(text_parts)
+        del text_parts  # full_text is the only copy of the document text kept around
+        
+        # Emit CHUNK_TOKENS-token windows that overlap by CHUNK_OVERLAP_TOKENS
+        num_tokens = len(token_offsets)
+        stride = CHUNK_TOKENS - CHUNK_OVERLAP_TOKENS
+        total_chunks = 0 if num_tokens == 0 else 1 + -(-max(0, num_tokens - CHUNK_TOKENS) // stride)
+        page_doc_metadata = {}
+        
+        def joined(i: int) -> bool:
+            """True if token i continues the word of token i - 1 (no whitespace between them)."""
+            return token_offsets[i][0] == token_offsets[i - 1][1]
+        
+        for window_start in range(0, num_tokens, stride):
+            window_end = min(window_start + CHUNK_TOKENS, num_tokens)
+            # Snap edges to word boundaries: pull the start back onto the word's first piece
+            # and drop a trailing partial word (the overlap carries it into the next window)
+            start = window_start
+            while start > 0 and window_start - start < CHUNK_SNAP_TOKENS and joined(start):
+                start -= 1
+            if start > 0 and joined(start):
+                start = window_start  # word longer than the snap range
+            end = window_end
+            while end < num_tokens and window_end - end < CHUNK_SNAP_TOKENS and joined(end):
+                end -= 1
+            if end < num_tokens and joined(end):
+                end = window_end
+            chunk_text = full_text[token_offsets[start][0]:token_offsets[end - 1][1]].strip()
+            first_page = token_pages[start]
+            if first_page not in page_doc_metadata:
+                page_doc_metadata[first_page] = asdict(self.get_metadata_for_page(first_page, page_chapter_map))
+            
+            if chunk_text:
+                chunks.append(DocumentChunk(
+                    chunk_text,
+                    {
+                        "source": self._source,
                         "chunk_size": len(chunk_text),
-                        "chunk_index": i // chunk_size,
-                        "total_chunks": (len(text) + chunk_size - 1) // chunk_size
-                    }
-                    
-                    chunks.append(DocumentChunk(
-                        text=chunk_text,
-                        metadata=chunk_metadata,
-                        document_metadata=doc_metadata,
-                        id=f"chunk_{chunk_id}"
-                    ))
-                    chunk_id += 1
-                
-                # Log page processing time
-                page_iterator.set_postfix({
-                    "chunks": len(chunks),
-                    "time": f"{time.time() - page_start_time:.1f}s"
-                })
+                        "token_count": end - start,
+                        "chunk_index": chunk_id,
+                        "total_chunks": total_chunks,
+                        "page_end": token_pages[end - 1],
+                        **page_doc_metadata[first_page]
+                    },
+                    f"chunk_{chunk_id}"
+                ))
+                chunk_id += 1
+            if window_end == num_tokens:
+                break
         
         print_success(f"PDF processing complete! Created {len(chunks)} chunks from {total_pages} pages")
         return chunks
     
-    def generate_embeddings(self, chunks: List[DocumentChunk]) -> List[List[float]]:
-        """Generate embeddings for the text chunks with optimized batching and GPU utilization."""
+    def generate_embeddings(self, chunks: List[DocumentChunk]) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (chunk indices, float32 embeddings) batches of up to CHROMA_BATCH_SIZE chunks.
+        
+        Identical chunk texts are encoded once and their embedding is fanned out to
+        every duplicate. Unique texts are encoded in global length order so every
+        encoder batch pads only to similar-length neighbours; the indices map each
+        embedding row back to its chunk.
+        """
         print_step("Generating Embeddings")
         print_info(f"Processing {len(chunks)} chunks")
+        self._ensure_embedding_model()
+        
+        # Deduplicate on the text itself: str hashes are cached and keys alias the chunk
+        # strings, so this skips the UTF-8 encode + digest per chunk and cannot collide.
+        # members[u] lists the chunks sharing unique text u
+        texts = []
+        members = []
+        seen = {}
+        for idx, chunk in enumerate(chunks):
+            unique_idx = seen.setdefault(chunk.text, len(texts))
+            if unique_idx == len(texts):
+                texts.append(chunk.text)
+                members.append([])
+            members[unique_idx].append(idx)
+        del seen
+        if len(texts) < len(chunks):
+            print_info(f"Skipping {len(chunks) - len(texts)} duplicate chunks ({len(texts)} unique)")
         
-        texts = [chunk.text for chunk in chunks]
         total_chars = sum(len(text) for text in texts)
         print_info(f"Total characters to process: {total_chars:,}")
         
         # Optimize batch size based on available GPU memory
         if torch.cuda.is_available():
             total_memory = torch.cuda.get_device_properties(0).total_memory / (1024 ** 3)  # in GB
-            batch_size = 128 if total_memory >= 16 else 64  # Larger batch for more memory
+            batch_size = 256 if total_memory >= 16 else 128  # half precision leaves room for larger batches
         else:
             batch_size = 32  # Conservative batch size for CPU
             
         print_info(f"Using batch size: {batch_size}")
         
-        all_embeddings = []
+        # Sort by the exact token count recorded at chunking time rather than a character proxy
+        token_counts = [chunks[group[0]].metadata["token_count"] for group in members]
+        order = np.argsort(token_counts, kind="stable")
         
-        # Use torch.no_grad for inference to save memory
-        with torch.no_grad(), torch.cuda.amp.autocast():
-            with tqdm(total=len(texts), desc="Generating embeddings", unit="chunk") as pbar:
-                for i in range(0, len(texts), batch_size):
-                    batch_texts = texts[i:i + batch_size]
+        with self._multi_gpu_pool() as pool, \
+                tqdm(total=len(texts), desc="Generating embeddings", unit="chunk") as pbar:
+            for start in range(0, len(order), CHROMA_BATCH_SIZE):
+                indices = order[start:start + CHROMA_BATCH_SIZE]
+                window = [texts[i] for i in indices]
+                while True:
                     try:
-                        # Process batch with optimized settings
-                        batch_embeddings = self.embedding_model.encode(
-                            batch_texts,
-                            batch_size=batch_size,
-                            show_progress_bar=False,
-                            convert_to_tensor=True,  # Keep on GPU for efficiency
-                            normalize_embeddings=True,
-                            convert_to_numpy=False  # Keep as tensor for now
-                        )
-                        
-                        # Move to CPU and convert to list in one go
-                        all_embeddings.extend(batch_embeddings.cpu().numpy().tolist())
-                        pbar.update(len(batch_texts))
-                        
-                        # Clear CUDA cache periodically
-                        if i % (batch_size * 10) == 0 and torch.cuda.is_available():
-                            torch.cuda.empty_cache()
-                            
+                        if pool is not None:
+                            # One contiguous slice of the length-sorted window per GPU
+                            embeddings = self.embedding_model.encode_multi_process(
+                                window,
+                                pool,
+                                batch_size=batch_size,
+                                chunk_size=-(-len(window) // len(pool["processes"]))
+                            )
+                            # encode_multi_process only takes normalize_embeddings on newer
+                            # sentence-transformers, so L2-normalise here (same eps as encode)
+                            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+                        else:
+                            with self._inference_context():
+                                embeddings = self.embedding_model.encode(
+                                    window,
+                                    batch_size=batch_size,
+                                    show_progress_bar=False,
+                                    convert_to_tensor=True,  # the ONNX backend ignores this and returns numpy
+                                    normalize_embeddings=True
+                                )
+                        break
                     except RuntimeError as e:
-                        if 'out of memory' in str(e).lower():
+                        if 'out of memory' in str(e).lower() and batch_size > 8:
                             print_warning("CUDA out of memory, reducing batch size and retrying...")
                             batch_size = max(8, batch_size // 2)  # Halve batch size but keep it reasonable
                             print_info(f"Reduced batch size to {batch_size}")
+                            if torch.cuda.is_available():
+                                torch.cuda.empty_cache()
                             continue
-                        else:
-                            print_error(f"Error processing batch {i//batch_size + 1}: {str(e)}")
-                            raise
-                    except Exception as e:
-                        print_error(f"Unexpected error processing batch {i//batch_size + 1}: {str(e)}")
+                        print_error(f"Error generating embeddings: {str(e)}")
                         raise
+                pbar.update(len(window))
+                if torch.is_tensor(embeddings):
+                    # Half-precision autocast outputs are upcast; ChromaDB stores float32 vectors
+                    embeddings = embeddings.float().cpu().numpy()
+                counts = [len(members[u]) for u in indices]
+                chunk_indices = np.fromiter((i for u in indices for i in members[u]), dtype=np.int64, count=sum(counts))
+                yield chunk_indices, np.repeat(embeddings.astype(np.float32, copy=False), counts, axis=0)
         
-        print_success(f"Generated {len(all_embeddings)} embeddings")
-        return all_embeddings
+        print_success(f"Generated {len(texts)} embeddings for {len(chunks)} chunks")
     
-    def store_in_chroma(self, chunks: List[DocumentChunk], embeddings: List[List[float]]):
-        """Store chunks and embeddings in ChromaDB with retry logic."""
+    def store_in_chroma(self, chunks: List[DocumentChunk], embedding_batches: Iterable[Tuple[np.ndarray, np.ndarray]]):
+        """Store chunks in ChromaDB as embedding batches arrive, with retry logic.
+        
+        The batches are pulled on a background thread, so encoding the next batch
+        overlaps with uploading the previous ones.
+        """
         print_step("Storing in ChromaDB")
         print_info(f"Storing {len(chunks)} chunks")
         
-        # Prepare data for ChromaDB
-        batch_size = 50
-        success_count = 0
+        batches = queue.Queue(maxsize=EMBEDDING_QUEUE_SIZE)
+        
+        def produce():
+            try:
+                for batch in embedding_batches:
+                    batches.put(batch)
+            except BaseException as e:
+                batches.put(e)
+            finally:
+                batches.put(None)
+        
+        producer = threading.Thread(target=produce, name="embedding-producer", daemon=True)
+        producer.start()
+        success_count = asyncio.run(self._upload_all(chunks, batches))
+        producer.join()
         
-        for i in tqdm(range(0, len(chunks), batch_size), desc="Storing in ChromaDB"):
-            batch_chunks = chunks[i:i + batch_size]
-            batch_embeddings = embeddings[i:i + batch_size]
+        # Surface failed batches instead of reporting a partial collection as success
+        if success_count < len(chunks):
+            raise RuntimeError(f"Only {success_count}/{len(chunks)} chunks were stored in ChromaDB")
+        print_success(f"Successfully stored {success_count}/{len(chunks)} chunks in ChromaDB")
+    
+    async def _upload_all(self, chunks: List[DocumentChunk], batches: queue.Queue) -> int:
+        """Upsert batches from the queue concurrently (bounded by a semaphore); returns the stored count."""
+        loop = asyncio.get_running_loop()
+        client = await chromadb.AsyncHttpClient(**CHROMA_CONNECTION)
+        collection = await client.get_collection(name=self.collection_name)
+        semaphore = asyncio.Semaphore(CHROMA_UPSERT_CONCURRENCY)
+        
+        async def upload_batch(indices: np.ndarray, batch_embeddings: np.ndarray) -> int:
+            batch_chunks = [chunks[i] for i in indices]
             
-            if not batch_chunks:
-                continue
-                
             # Prepare batch data
             ids = [chunk.id for chunk in batch_chunks]
             documents = [chunk.text for chunk in batch_chunks]
-            metadatas = [{
-                **chunk.metadata,
-                "part": chunk.document_metadata.part,
-                "part_title": chunk.document_metadata.part_title,
-                "chapter": chunk.document_metadata.chapter,
-                "chapter_title": chunk.document_metadata.chapter_title,
-                "page_number": chunk.document_metadata.page_number
-            } for chunk in batch_chunks]
+            metadatas = [chunk.metadata for chunk in batch_chunks]
             
             # Store with retry logic
             max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    self.collection.upsert(
-                        documents=documents,
-                        embeddings=batch_embeddings,
-                        metadatas=metadatas,
-                        ids=ids
-                    )
-                    success_count += len(batch_chunks)
-                    break
-                except Exception as e:
-                    if attempt == max_retries - 1:
-                        print_error(f"Failed to store batch after {max_retries} attempts: {str(e)}")
-                    time.sleep(1)  # Wait before retry
+            try:
+                for attempt in range(max_retries):
+                    try:
+                        # The collection is recreated every run, so add() suffices (no upsert lookup)
+                        await collection.add(
+                            documents=documents,
+                            embeddings=batch_embeddings,
+                            metadatas=metadatas,
+                            ids=ids
+                        )
+                        return len(batch_chunks)
+                    except Exception as e:
+                        if attempt == max_retries - 1:
+                            print_error(f"Failed to store batch after {max_retries} attempts: {str(e)}")
+                        else:
+                            await asyncio.sleep(UPSERT_RETRY_BACKOFF * 2 ** attempt)  # Exponential backoff
+                return 0
+            finally:
+                semaphore.release()
         
-        print_success(f"Successfully stored {success_count}/{len(chunks)} chunks in ChromaDB")
+        tasks = []
+        while True:
+            batch = await loop.run_in_executor(None, batches.get)
+            if batch is None:
+                break
+            if isinstance(batch, BaseException):
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise batch
+            # Acquire before scheduling so a slow server applies backpressure to the encoder
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(upload_batch(*batch)))
+        return sum(await asyncio.gather(*tasks))
+    
+    def _cache_path(self, test_mode: bool) -> str:
+        """Cache file keyed on the PDF and chapter metadata bytes, the model and the chunking parameters."""
+        digest = hashlib.blake2b(digest_size=16)
+        for path in (self.pdf_path, RAG_SOURCES_DIR / "chapters-distribution.json",
+                     RAG_SOURCES_DIR / "parts-distribution.json"):
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        # compile_model also switches FP8 linears on, which changes the embedding numerics
+        digest.update(f"{self.model_name}|{self.backend}|{self.compile_model}|{CHUNK_TOKENS}|{CHUNK_OVERLAP_TOKENS}|"
+                      f"{CHUNK_SNAP_TOKENS}|{test_mode}".encode('utf-8'))
+        return os.path.join(self.models_dir, 'cache', f"{digest.hexdigest()}.npz")
+    
+    def _load_cache(self, cache_path: str) -> Optional[Tuple[List[DocumentChunk], np.ndarray]]:
+        """Load cached chunks and their embeddings (row i belongs to chunk i), if present."""
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with np.load(cache_path) as cache:
+                chunks_json = cache["chunks"]
+                embeddings = cache["embeddings"]
+            if chunks_json.dtype != np.uint8 or embeddings.dtype != np.float32:
+                # Older caches held UCS-4 chunk text or float16 vectors; re-encode rather than reuse them
+                print_info(f"Ignoring cache in an older format, re-encoding: {cache_path}")
+                return None
+            chunks = [DocumentChunk(*record) for record in json.loads(chunks_json.tobytes().decode('utf-8'))]
+            print_success(f"Loaded {len(chunks)} cached chunks and embeddings: {cache_path}")
+            return chunks, embeddings
+        except Exception as e:
+            print_warning(f"Ignoring unreadable cache {cache_path}: {str(e)}")
+            return None
     
-    def process(self, test_mode: bool = False):
+    def _caching_embeddings(self, chunks: List[DocumentChunk], cache_path: str) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Pass generate_embeddings batches through, then save the full run to cache_path."""
+        embeddings = None
+        for indices, batch_embeddings in self.generate_embeddings(chunks):
+            if embeddings is None:
+                embeddings = np.empty((len(chunks), batch_embeddings.shape[1]), dtype=batch_embeddings.dtype)
+            embeddings[indices] = batch_embeddings
+            yield indices, batch_embeddings
+        
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # Chunk JSON as UTF-8 bytes; a numpy unicode scalar would spend 4 bytes per character
+        chunks_json = np.frombuffer(json.dumps(chunks).encode('utf-8'), dtype=np.uint8)
+        np.savez_compressed(cache_path, chunks=chunks_json, embeddings=embeddings)
+        print_info(f"Cached chunks and embeddings: {cache_path}")
+    
+    @staticmethod
+    def _cached_batches(embeddings: np.ndarray) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Replay cached embeddings as CHROMA_BATCH_SIZE batches in chunk order."""
+        for start in range(0, len(embeddings), CHROMA_BATCH_SIZE):
+            end = min(start + CHROMA_BATCH_SIZE, len(embeddings))
+            yield np.arange(start, end), embeddings[start:end]
+    
+    def process(self, test_mode: bool = False, use_cache: bool = True):
         """Main processing pipeline."""
         print_step("Starting Textbook Processing")
         start_time = time.time()
         
         try:
-            # Extract text and metadata
-            chunks = self.extract_text_with_metadata(test_mode)
-            if not chunks:
-                raise ValueError("No content was extracted from the PDF")
-            
-            # Generate embeddings
-            embeddings = self.generate_embeddings(chunks)
+            cache_path = self._cache_path(test_mode)
+            cached = self._load_cache(cache_path) if use_cache else None
+            if cached:
+                chunks, embeddings = cached
+                embedding_batches = self._cached_batches(embeddings)
+            else:
+                # Extract text and metadata
+                chunks = self.extract_text_with_metadata(test_mode)
+                if not chunks:
+                    raise ValueError("No content was extracted from the PDF")
+                embedding_batches = self._caching_embeddings(chunks, cache_path)
             
-            # Store in ChromaDB
-            self.store_in_chroma(chunks, embeddings)
+            # Generate embeddings and store them in ChromaDB as each batch is ready
+            self.store_in_chroma(chunks, embedding_batches)
             
             # Print summary
             processing_time = time.time() - start_time
@@ -462,6 +833,14 @@ if __name__ == "__main__":
     parser.add_argument("--test", action="store_true", help="Run in test mode (process only first 10 pages)")
     parser.add_argument("--model", default="BAAI/bge-large-en-v1.5", 
                        help="Hugging Face model to use for embeddings")
+    parser.add_argument("--backend", choices=["torch", "onnx", "tensorrt"], default="torch",
+                       help="Embedding runtime: sentence-transformers (torch), ONNX Runtime via optimum, "
+                            "or ONNX Runtime's TensorRT provider (CUDA only)")
+    parser.add_argument("--compile", action="store_true",
+                       help="torch.compile the embedding model (torch backend only); on SM89+ GPUs "
+                            "with torchao installed, linear layers also run in FP8")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Ignore cached chunks/embeddings from a previous run of the same PDF")
     
     args = parser.parse_args()
     
@@ -472,8 +851,9 @@ if __name__ == "__main__":
     
     # Process the textbook
     try:
-        processor = TextbookProcessor(args.pdf_path, args.model)
-        success = processor.process(test_mode=args.test)
+        processor = TextbookProcessor(args.pdf_path, args.model, backend=args.backend,
+                                      compile_model=args.compile)
+        success = processor.process(test_mode=args.test, use_cache=not args.no_cache)
         sys.exit(0 if success else 1)
     except KeyboardInterrupt:
         print_error("Processing interrupted by user")
@@ -14,7 +14,8 @@ import sys
 import time
 import json
 import argparse
-from typing import List, Dict, Any
+from itertools import islice
+from typing import List, Dict, Any, Iterator
 from tqdm import tqdm
 import numpy as np
 from sentence_transformers import SentenceTransformer
@@ -72,29 +73,43 @@ class SummariesProcessor:
             headers={'Authorization': 'Bearer test-token'}
         )
         print_info("Connected to ChromaDB server")
+        # Drop and recreate rather than delete(where=...), which scans every record
         try:
-            self.collection = self.client.get_collection(name=self.collection_name)
-            print_info(f"Using existing collection: {self.collection_name}")
-            self.collection.delete(where={"$exists": True})
-            print_info(f"Cleared existing data from collection: {self.collection_name}")
+            self.client.delete_collection(name=self.collection_name)
+            print_info(f"Cleared existing collection: {self.collection_name}")
         except Exception:
-            print_info(f"Creating new collection: {self.collection_name}")
-            self.collection = self.client.create_collection(
-                name=self.collection_name,
-                metadata={"hnsw:space": "cosine"}
-            )
-            print_info(f"Created new collection: {self.collection_name}")
+            print_info(f"No existing collection to clear: {self.collection_name}")
+        print_info(f"Creating new collection: {self.collection_name}")
+        self.collection = self.client.create_collection(
+            name=self.collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+        print_info(f"Created new collection: {self.collection_name}")
+
+    def iter_chunks(self, block_size: int = 1 << 20) -> Iterator[str]:
+        """Yield the '----'-separated chunks of the file, reading it in blocks."""
+        buffer = ""
+        with open(self.txt_path, 'r', encoding='utf-8') as f:
+            for block in iter(lambda: f.read(block_size), ''):
+                # The last part may be incomplete (or end in a partial separator); carry it over
+                *parts, buffer = (buffer + block).split('----')
+                for part in parts:
+                    part = part.strip()
+                    if part:
+                        yield part
+        buffer = buffer.strip()
+        if buffer:
+            yield buffer
 
     def chunk_text(self, test_mode: bool = False) -> List[str]:
         print_step("Reading and chunking summaries.txt")
-        with open(self.txt_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        # Split by '----' separator
-        chunks = [chunk.strip() for chunk in content.split('----') if chunk.strip()]
-        print_info(f"Total chunks found: {len(chunks)}")
         if test_mode:
+            # Stops reading the file once 30 chunks have been found
             print_warning("TEST MODE: Only processing first 30 chunks")
-            chunks = chunks[:30]
+            chunks = list(islice(self.iter_chunks(), 30))
+        else:
+            chunks = list(self.iter_chunks())
+        print_info(f"Total chunks found: {len(chunks)}")
         return chunks
 
     def generate_embeddings(self, chunks: List[str], batch_size: int = 16) -> List[List[float]]: